@@ -2,14 +2,13 @@
 
 import streamlit as st
 import pandas as pd
-import base64
 import asyncio
+import time
 from datetime import datetime
 from io import BytesIO
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import uuid
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
@@ -18,26 +17,47 @@ import datetime
 from datetime import timedelta
 
 SCOPES = ['https://www.googleapis.com/auth/calendar.events']
-from constants import AZURE_CONFIG
+from constants import AZURE_CONFIG, WEIGHTS
 from utils import (
-    parse_resume,
-    get_text_chunks,
     get_embedding_cached,
-    get_cosine_similarity,
+    get_resume_similarity,
     upload_to_blob,
-    extract_contact_info,
     save_summary_to_blob,
-    save_csv_to_blob
+    RESUME_TOKEN_BUDGET
 )
-from backend import get_resume_analysis_async, extract_role_from_jd
-from pdf_utils import generate_summary_pdf
-from email_generator import send_email, check_missing_info, send_missing_info_email, schedule_interview
+from backend import get_resume_analysis_async, prepare_jd, triage_resume_async, skipped_json, close_async_client, EVAL_PROMPT_VERSION
+from storage import content_hash
+from candidate_store import build_candidate_frame, concat_candidate_frames, hydrate, attach_list_fields, load_deliveries
+from scoring import ensure_score_columns, classify_candidates, SUBSCORE_COLUMNS, VERDICTS
+from pipeline import iter_extracted, iter_embedded, PARSE_WORKERS
+import jobs
+from dedup import DedupIndex, duplicate_record
+import eval_cache
+import talent_pool
+from cascade import (
+    iter_cascade,
+    new_stats,
+    summarize as summarize_cascade,
+    CASCADE_MIN_SIMILARITY,
+    CASCADE_TOP_K,
+    CASCADE_TRIAGE,
+    CASCADE_TRIAGE_MIN
+)
+from pdf_utils import get_summary_pdf, summary_pdf_key
+from exports import export_csv_if_changed, export_parquet_if_changed, to_csv_text, to_parquet_bytes, PARQUET_AVAILABLE
+from email_generator import check_missing_info, allocate_slots, WORKDAY_START
+from mailer import normalize_recipient
+import outbox
 # flow = InstalledAppFlow.from_client_secrets_file(
 #     'credentials.json', SCOPES
 # )
 # creds = flow.run_local_server(port=0)
 
 
+# Live results table while a batch is running (redrawn at most once per UI_REFRESH_SECONDS)
+UI_REFRESH_SECONDS = 0.5
+LIVE_COLUMNS = ["name", "email", "score", "jd_similarity", "skills_match", "domain_match", "experience_match", "verdict", "fitment"]
+
 # At the top of your Streamlit app
 if "candidate_df" not in st.session_state:
     st.session_state["candidate_df"] = None
@@ -52,8 +72,16 @@ st.markdown("---")
 with st.sidebar:
     jd = st.text_area("📄 Paste Job Description", height=200)
     role = "N/A"
+    jd_embedding = None
     if jd:
-        role = extract_role_from_jd(jd)
+        # Role extraction and JD embedding run once per distinct JD (in parallel), not per rerun
+        jd_info = st.session_state.setdefault("jd_info", {})
+        jd_key = content_hash(jd)
+        if jd_key not in jd_info:
+            jd_role, jd_vector = prepare_jd(jd)
+            jd_info[jd_key] = {"role": jd_role, "embedding": jd_vector if any(jd_vector) else None}
+        role = jd_info[jd_key]["role"]
+        jd_embedding = jd_info[jd_key]["embedding"]
         st.markdown(f"🧠 **Extracted Role:** `{role}`")
 
     domain = st.text_input("🏢 Preferred Domain", "")
@@ -67,146 +95,496 @@ with st.sidebar:
     exp_thresh = st.slider("Experience Match", 0, 100, 50)
     score_thresh = st.slider("Final Score Threshold", 0, 100, 50)
     top_n = st.number_input("🎯 Top-N Candidates", 0, value=0)
+    thresholds = {"jd_similarity": jd_thresh, "skills_match": skill_thresh,
+                  "domain_match": domain_thresh, "experience_match": exp_thresh}
+    page_size = st.selectbox("🗂️ Candidates per page", [10, 25, 50, 100], index=1)
+
+    with st.expander("⚖️ Score Weights"):
+        weights = {
+            col: st.number_input(col.replace("_", " ").title(), 0.0, 1.0, float(WEIGHTS[col]), 0.05, key=f"weight_{col}")
+            for col in SUBSCORE_COLUMNS
+        }
+
+    screening_mode = st.radio("📂 Candidates", ["Upload resumes", "Search existing pool"], horizontal=True)
+    uploaded_files = []
+    pool_top_k = 0
+    if screening_mode == "Upload resumes":
+        uploaded_files = st.file_uploader("📤 Upload Resumes (PDF)", type=["pdf"], accept_multiple_files=True)
+    else:
+        st.caption(f"🗂️ {talent_pool.pool_size()} candidates in the talent pool")
+        pool_top_k = st.number_input("🔎 Top-K pool candidates to evaluate", 1, value=20)
+
+    st.markdown("### ♻️ Evaluation Cache")
+    refresh_cache = st.checkbox("Re-evaluate with GPT (ignore cached results)", value=False)
+    if st.button("🗑️ Clear Evaluation Cache"):
+        eval_cache.clear()
+        st.success("Evaluation cache cleared.")
+
+    with st.expander("⚡ Prefilter Cascade"):
+        cascade_min_sim = st.slider("Min JD similarity for deep evaluation", 0, 100, int(CASCADE_MIN_SIMILARITY))
+        cascade_top_k = st.number_input("Deep-evaluate only the top-K (0 = all)", 0, value=int(CASCADE_TOP_K))
+        cascade_triage = st.checkbox("Fast GPT triage before deep evaluation", value=bool(CASCADE_TRIAGE))
+        cascade_triage_min = st.slider("Min triage score", 0, 100, int(CASCADE_TRIAGE_MIN), disabled=not cascade_triage)
 
-    uploaded_files = st.file_uploader("📤 Upload Resumes (PDF)", type=["pdf"], accept_multiple_files=True)
     analyze = st.button("🚀 Analyze")
 
-# ========== Processing ==========
-if jd and uploaded_files and analyze and not st.session_state["analysis_done"]:
-    progress = st.progress(0, text="Starting Analysis...")
-    total = len(uploaded_files)
-    results = []
-    jd_embedding = get_embedding_cached(jd)
-    
+    # Interrupted upload batches (refresh, restart, API outage) resume from their checkpoints
+    resume_job_id = None
+    unfinished_jobs = jobs.list_jobs()
+    if unfinished_jobs:
+        with st.expander(f"🧾 Unfinished Jobs ({len(unfinished_jobs)})"):
+            job_labels = {
+                job_id: f"{params.get('role', 'N/A')} · {total} resumes · {status} · {datetime.datetime.fromtimestamp(updated):%d %b %H:%M}"
+                for job_id, params, status, total, updated in unfinished_jobs
+            }
+            selected_job = st.selectbox("Job", list(job_labels), format_func=job_labels.get)
+            if st.button("▶️ Resume Job"):
+                resume_job_id = selected_job
+            if st.button("🗑️ Discard Job"):
+                jobs.delete_job(selected_job)
+                st.rerun()
+
+    # Starting the worker also resumes deliveries left queued by a previous run
+    outbox.get_worker()
+    outbox_counts = outbox.status_counts()
+    if outbox_counts:
+        st.caption("📬 Outbox: " + " · ".join(f"{n} {status}" for status, n in sorted(outbox_counts.items())))
 
-    async def process_all():
-        tasks = []
-        for idx, file in enumerate(uploaded_files):
+# ========== Processing ==========
+if (jd and (uploaded_files or pool_top_k) and analyze and not st.session_state["analysis_done"]) or resume_job_id:
+    screening_job = None
+    if resume_job_id:
+        # A resumed job runs with the JD, criteria and cascade settings it was started with
+        screening_job = jobs.ScreeningJob(resume_job_id)
+        job_params = screening_job.params
+        jd, role, domain, skills, exp_range = (job_params[k] for k in ("jd", "role", "domain", "skills", "experience_range"))
+        cascade_min_sim, cascade_top_k, cascade_triage, cascade_triage_min = (
+            job_params[k] for k in ("cascade_min_similarity", "cascade_top_k", "cascade_triage", "cascade_triage_min")
+        )
+        refresh_cache = job_params.get("refresh_cache", False)
+        jd_embedding = None
+    elif uploaded_files:
+        payloads = []
+        for file in uploaded_files:
             file_bytes = file.read()
             file_name = file.name.replace(".pdf", "")
             upload_to_blob(file_bytes, file_name + ".pdf", AZURE_CONFIG["resumes_container"])
+            payloads.append((file_name, file_bytes))
+        job_params = {
+            "jd": jd, "role": role, "domain": domain, "skills": skills, "experience_range": exp_range,
+            "cascade_min_similarity": cascade_min_sim, "cascade_top_k": cascade_top_k,
+            "cascade_triage": cascade_triage, "cascade_triage_min": cascade_triage_min,
+            "prompt_version": EVAL_PROMPT_VERSION, "refresh_cache": refresh_cache,
+            # A forced re-evaluation is a new job rather than a resume of the cached one
+            "refresh_nonce": time.time() if refresh_cache else None
+        }
+        # Re-submitting the same batch with the same settings resumes its job
+        screening_job = jobs.ScreeningJob.create(job_params, payloads)
+        del payloads
+    if screening_job:
+        screening_job.start()
 
-            resume_text = parse_resume(file_bytes)
-            contact = extract_contact_info(resume_text)
-
-            chunks = get_text_chunks(resume_text)
-            resume_embedding = get_embedding_cached(" ".join(chunks))
-            jd_sim = round(get_cosine_similarity(resume_embedding, jd_embedding) * 100, 2)
-
-            task = get_resume_analysis_async(
+    progress = st.progress(0, text="Starting Analysis...")
+    stage_counts = st.empty()
+    live_view = st.empty()
+    if jd_embedding is None:
+        jd_embedding = get_embedding_cached(jd)
+    cascade_stats = new_stats()
+    counts = {"total": screening_job.total if screening_job else pool_top_k, "parsed": 0, "embedded": 0, "evaluated": 0,
+              "skipped": 0, "failed": 0, "duplicates": 0, "cache_hits": 0, "fresh_calls": 0, "replayed": 0, "dedup_tokens": 0,
+              "pages_read": 0, "pages_total": 0, "budget_stopped": 0,
+              "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "eval_latency": 0.0}
+    if screening_job:
+        checkpoint = screening_job.progress()
+        counts["parsed"], counts["embedded"] = checkpoint["parsed"], checkpoint["embedded"]
+    # Finished records are folded into compact frame parts as they arrive; nothing waits for the batch
+    frames, new_results, duplicates = [], [], []
+    last_refresh = [0.0]
+
+    def refresh_progress(force=False):
+        now = time.perf_counter()
+        if not force and now - last_refresh[0] < UI_REFRESH_SECONDS:
+            return
+        last_refresh[0] = now
+        if new_results:
+            frames.append(build_candidate_frame(new_results))
+            new_results.clear()
+
+        done = counts["evaluated"] + counts["skipped"] + counts["failed"] + counts["duplicates"]
+        total = counts["total"]
+        progress.progress(min(done / total, 1.0) if total else 1.0, text=f"Processed {done} of {total}...")
+        stage_counts.markdown(
+            f"📄 Parsed **{counts['parsed']}** · 🧠 Embedded **{counts['embedded']}** · "
+            f"✅ Evaluated **{counts['evaluated']}** · ⏭️ Skipped **{counts['skipped']}** · ❌ Failed **{counts['failed']}** · "
+            f"🧬 Duplicates **{counts['duplicates']}**"
+        )
+        if frames:
+            live = classify_candidates(ensure_score_columns(concat_candidate_frames(frames)),
+                                       weights, thresholds, score_thresh, top_n)
+            live = live.sort_values("score", ascending=False, kind="stable")[LIVE_COLUMNS]
+            with live_view.container():
+                st.markdown("#### 🏆 Shortlist so far")
+                st.dataframe(live[live["verdict"] == "shortlist"].head(page_size), hide_index=True)
+                st.markdown(f"#### 📋 Results so far ({len(live)})")
+                st.dataframe(live, hide_index=True)
+
+    def record_result(result):
+        replayed = result.pop("replayed", False)
+        if result.get("duplicate_of"):
+            # Linked to the canonical candidate's evaluation; not a separate candidate
+            counts["duplicates"] += 1
+            duplicates.append(result)
+            refresh_progress()
+            return
+        result["recruiter_notes"] = ""
+        if result.get("prefiltered"):
+            counts["skipped"] += 1
+        elif result.get("evaluation_failed"):
+            counts["failed"] += 1
+        else:
+            counts["evaluated"] += 1
+        if replayed:
+            # Restored from the job checkpoint; its call and tokens were spent by the earlier run
+            counts["replayed"] += 1
+        elif result.get("eval_cache_hit") is True:
+            counts["cache_hits"] += 1
+        elif result.get("eval_cache_hit") is False:
+            counts["fresh_calls"] += 1
+            for field in ("prompt_tokens", "completion_tokens", "cached_tokens", "eval_latency"):
+                counts[field] += result.get(field, 0)
+        new_results.append(result)
+        refresh_progress()
+
+    async def count_stage(stream, stage):
+        async for item in stream:
+            counts[stage] += 1
+            refresh_progress()
+            yield item
+
+    async def screen_uploads():
+        # Candidates finished in an earlier (interrupted) run come straight from the checkpoints
+        dedup = DedupIndex()
+        linked = []
+        for record in screening_job.completed_results():
+            if not record.get("duplicate_of"):
+                dedup.add(record.get("job_item", record["resume_file"]), record.get("resume_text", ""), record.get("email"))
+            record["replayed"] = True
+            yield record
+
+        # PDFs are parsed in a process pool and embedded in batches; stage 1 of the
+        # cascade prunes on JD similarity (and optional fast triage) before the deep model.
+        # Each parse, embedding and final record is checkpointed as soon as it exists, keyed by
+        # the job item (upload slot + file name) so same-named uploads never collide.
+
+        def is_duplicate(item, extracted):
+            # Exact / near-duplicate resumes are linked to the first copy right after parsing,
+            # so they never reach the embedding or GPT calls
+            match = dedup.check(item, extracted["resume_text"], extracted["contact"].get("email"))
+            if match is None:
+                return False
+            canonical, kind, similarity = match
+            link = duplicate_record(jobs.display_name(item), jobs.display_name(canonical), kind, similarity,
+                                    extracted["contact"])
+            link["job_item"] = item
+            screening_job.save_result(item, link)
+            counts["dedup_tokens"] += len(extracted["tokens"])
+            linked.append(link)
+            return True
+
+        async def parsed():
+            for item, _, extracted in screening_job.parsed_items():
+                if not is_duplicate(item, extracted):
+                    yield item, None, extracted
+            new_parses = iter_extracted(screening_job.pending_payloads(), max_in_flight=PARSE_WORKERS * 2)
+            async for item, _, extracted in count_stage(new_parses, "parsed"):
+                screening_job.save_parse(item, extracted)
+                pages = extracted["extraction"]
+                counts["pages_read"] += pages["pages_read"]
+                counts["pages_total"] += pages["page_count"]
+                counts["budget_stopped"] += pages["truncated"]
+                if not is_duplicate(item, extracted):
+                    yield item, None, extracted
+
+        async def embedded():
+            for restored in screening_job.embedded_items():
+                dedup.add(restored[0], restored[2]["resume_text"], restored[2]["contact"].get("email"))
+                yield restored
+            async for item, _, extracted, resume_embedding in count_stage(iter_embedded(parsed()), "embedded"):
+                screening_job.save_embedding(item, extracted["chunk_vectors"], resume_embedding)
+                yield item, None, extracted, resume_embedding
+
+        async def stage1():
+            async for item, _, extracted, resume_embedding in embedded():
+                yield {
+                    "job_item": item,
+                    "resume_file": jobs.display_name(item),
+                    "resume_text": extracted["resume_text"],
+                    "contact": extracted["contact"],
+                    "tokens": extracted["tokens"],
+                    "jd_similarity": round(get_resume_similarity(extracted["chunk_vectors"], jd_embedding) * 100, 2)
+                }
+
+        async def deep_evaluate(candidate):
+            record = await get_resume_analysis_async(
                 jd=jd,
-                resume_text=resume_text,
-                contact=contact,
+                resume_text=candidate["resume_text"],
+                contact=candidate["contact"],
                 role=role,
                 domain=domain,
                 skills=skills,
                 experience_range=exp_range,
-                jd_similarity=jd_sim,
-                resume_file=file_name
+                jd_similarity=candidate["jd_similarity"],
+                resume_file=candidate["resume_file"],
+                refresh_cache=refresh_cache,
+                resume_tokens=candidate["tokens"]
             )
-            tasks.append(task)
+            record["job_item"] = candidate["job_item"]
+            return record
+
+        def skip(candidate, reason):
+            record = skipped_json(candidate["contact"], role, candidate["jd_similarity"],
+                                  candidate["resume_text"], candidate["resume_file"], reason)
+            record["job_item"] = candidate["job_item"]
+            return record
+
+        def triage(candidate):
+            return triage_resume_async(jd, candidate["resume_text"], role)
+
+        async for record in iter_cascade(
+            stage1(), deep_evaluate, skip,
+            triage=triage if cascade_triage else None,
+            min_similarity=cascade_min_sim,
+            top_k=cascade_top_k,
+            triage_min=cascade_triage_min,
+            stats=cascade_stats
+        ):
+            screening_job.save_result(record["job_item"], record)
+            yield record
+            while linked:
+                yield linked.pop()
+        while linked:
+            yield linked.pop()
+
+        # Keep every screened resume searchable for future JDs. Read from the job's embedding
+        # checkpoints, so candidates finished before an interruption are included too.
+        talent_pool.add_candidates(screening_job.pool_records())
+
+    async def screen_pool():
+        # Rank the stored talent pool against this JD, then deep-evaluate only the top-K
+        matches = talent_pool.search(jd_embedding, top_k=pool_top_k)
+        tasks = [
+            get_resume_analysis_async(
+                jd=jd,
+                resume_text=match["resume_text"],
+                contact=match["contact"],
+                role=role,
+                domain=domain,
+                skills=skills,
+                experience_range=exp_range,
+                jd_similarity=round(match["similarity"] * 100, 2),
+                resume_file=match["resume_file"],
+                refresh_cache=refresh_cache
+            )
+            for match in matches
+        ]
+        counts["total"] = len(tasks)
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
 
-        return await asyncio.gather(*tasks)
+    async def process_all():
+        try:
+            async for record in (screen_uploads() if screening_job else screen_pool()):
+                record_result(record)
+        finally:
+            await close_async_client()
 
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-
-    for i in range(len(uploaded_files)):
-        progress.progress(i / total, text=f"Processing {i+1} of {total}...")
-
-    results = loop.run_until_complete(process_all())
+    loop.run_until_complete(process_all())
     loop.close()
-
-    for r in results:
-        r["recruiter_notes"] = ""
-        if r["score"] < score_thresh and r["verdict"] != "reject":
-            r["verdict"] = "reject"
-            r.setdefault("reasons_if_rejected", []).append(
-                f"Score below threshold {r['score']} < {score_thresh}"
-            )
+    if screening_job:
+        screening_job.finish()
+    refresh_progress(force=True)
+    live_view.empty()
 
     st.success("✅ All resumes processed!")
-    df = pd.DataFrame(results).fillna("N/A")
-    df.replace("n/a", "N/A", regex=True, inplace=True)
-    missing_info = df[df.apply(lambda row: not row.get("contact", {}).get("email"), axis=1)]
-    for _, row in missing_info.iterrows():
-        email = row.get("contact", {}) or {}
-        #email= contact.get('email')
-        if email:
-            send_missing_info_email(email=email, name=row.get("name", "Candidate"))
-
-    #df = df[~df.index.isin(missing_info_df.index)]
-    df["has_missing_info"] = df.apply(lambda row: not row.get("contact", {}).get("email") or not row.get("contact", {}).get("phone"), axis=1)
-
-    for _, row in df[df["has_missing_info"]].iterrows():
-        email = row.get("contact", {}).get("email")
-        if email:
-            send_missing_info_email(email=email, name=row["name"])
-
-    # Verdict Logic
-    def verdict_logic(row):
-        #if row["has_missing_info"]:
-            #return "review"
-        if row["verdict"] == "reject":
-            return "reject"
-        elif (
-            row["jd_similarity"] < jd_thresh or
-            row["skills_match"] < skill_thresh or
-            row["domain_match"] < domain_thresh or
-            row["experience_match"] < exp_thresh
-        ):
-            return "review"
-        return "shortlist"
-
-    df["verdict"] = df.apply(verdict_logic, axis=1)
-
-    # Top-N Shortlisting
-    if top_n > 0:
-        sorted_df = df.sort_values("score", ascending=False)
-        top = sorted_df.head(top_n).copy()
-        top["verdict"] = "shortlist"
-        rest = sorted_df.iloc[top_n:].copy()
-        rest["verdict"] = rest["verdict"].apply(lambda v: v if v == "reject" else "review")
-        df = pd.concat([top, rest], ignore_index=True)
+    if cascade_stats["stage1"]:
+        st.info(f"⚡ {summarize_cascade(cascade_stats)}")
+    st.info(f"♻️ GPT evaluations: {counts['cache_hits']} served from cache, {counts['fresh_calls']} fresh calls"
+            + (f", {counts['replayed']} restored from the job checkpoint" if counts["replayed"] else ""))
+    if counts["fresh_calls"]:
+        st.info(f"🧾 Deep evaluation tokens: {counts['prompt_tokens']:,} prompt "
+                f"({counts['cached_tokens']:,} from the provider's prompt cache) · {counts['completion_tokens']:,} completion · "
+                f"avg {counts['prompt_tokens'] // counts['fresh_calls']:,} prompt tokens and "
+                f"{counts['eval_latency'] / counts['fresh_calls']:.1f}s per call")
+    if counts["budget_stopped"]:
+        st.info(f"📄 Read {counts['pages_read']} of {counts['pages_total']} PDF pages — {counts['budget_stopped']} long "
+                f"resumes were extracted only up to the {RESUME_TOKEN_BUDGET:,}-token budget")
+    if duplicates:
+        exact = sum(1 for d in duplicates if d["dedup_match"] == "exact")
+        st.info(f"🧬 Dedup: {exact} exact and {len(duplicates) - exact} near-duplicate resumes linked to an earlier copy — "
+                f"{len(duplicates)} embeddings and GPT evaluations skipped"
+                + (f" (~{counts['dedup_tokens']:,} resume tokens)" if counts["dedup_tokens"] else ""))
+    st.session_state["duplicates"] = pd.DataFrame(duplicates)
+    # Compact typed frame in session_state; resume text and list fields live in the side store
+    df = concat_candidate_frames(frames)
+    del frames
+    if df.empty:
+        st.warning("⚠️ No candidates were processed.")
+        st.stop()
+    # Scores, thresholds and Top-N are applied on every rerun by scoring.classify_candidates
+    df = ensure_score_columns(df)
     st.session_state["candidate_df"] = df
     st.session_state["analysis_done"] = True
 
     # ========== Display Tabs ==========
 if st.session_state["candidate_df"] is not None:
-    df = st.session_state.get("candidate_df", pd.DataFrame())  # fetch safely
+    # Re-score and re-classify from the stored sub-scores on every rerun (sliders, weights)
+    base_df = st.session_state["candidate_df"]
+
+    def record_verdict_override(idx, widget_key):
+        base_df.at[idx, "verdict_override"] = st.session_state[widget_key]
+
+    df = classify_candidates(base_df, weights, thresholds, score_thresh, top_n)
     tabs = st.tabs(["✅ Shortlisted", "🟨 Under Review", "❌ Rejected", "📊 Analytics"])
-    REQUIRED_FIELDS = ["email", "name", "phone"]  # Add or remove as per your needs
-    # def get_missing_fields(row):
-    #     missing = []
-    #     for field in REQUIRED_FIELDS:
-    #         if pd.isna(row.get(field)) or str(row.get(field)).strip() == "":
-    #             missing.append(field)
-    #     return missing
-    under_review = []
-    shortlisted = []
-    rejected = []
-    
-
-    for idx, row in df.iterrows():
-        missing_fields = check_missing_info(row)
-        if missing_fields:
-            row["verdict"] = "under review"  # Store what is missing
-            under_review.append(row)
-        elif row["verdict"] == "shortlisted":
-            shortlisted.append(row)
-        elif row["verdict"] == "rejected":
-            rejected.append(row)
-    def send_missing_info_email(email, missing_fields):
+    REQUIRED_FIELDS = ["name", "email", "phone"]  # Add or remove as per your needs
+
+    def record_note(idx, widget_key):
+        base_df.at[idx, "recruiter_notes"] = st.session_state[widget_key]
+
+    DELIVERY_ICONS = {"queued": "⏳", "retrying": "🔁", "sent": "✅", "failed": "❌"}
+
+    def queue_email(row, template, subject, body):
+        # Enqueue into the durable outbox; the click returns at once and repeats are no-ops
+        if not normalize_recipient(row["email"]):
+            st.warning(f"⚠️ No valid email address for {row['name']}.")
+            return
+        _, status = outbox.enqueue("email", row["recipient_id"], template, jd,
+                                   {"to": row["email"], "subject": subject, "body": body})
+        if status == "sent":
+            st.info(f"ℹ️ Already sent to {row['name']}; not sending again.")
+        else:
+            st.success(f"📬 Email to {row['name']} queued.")
+
+    def request_missing_info(row, missing_fields):
         missing_str = ', '.join(missing_fields)
         subject = "Missing Information for Job Application"
         body = f"Dear Candidate,\n\nWe noticed that the following information is missing from your profile: {missing_str}.\nPlease reply with the necessary details at your earliest convenience.\n\nRegards,\nRecruitment Team"
-        send_email(email, subject, body)
+        queue_email(row, "missing_info", subject, body)
+
+    def paginate(frame, page_key):
+        # Highest score first; only one page of cards is built per rerun, whatever the pool size
+        frame = frame.sort_values("score", ascending=False, kind="stable")
+        n_pages = max(1, -(-len(frame) // page_size))
+        if st.session_state.get(page_key, 1) > n_pages:
+            st.session_state[page_key] = n_pages
+        page = st.number_input(f"Page (of {n_pages})", 1, n_pages, key=page_key) if n_pages > 1 else 1
+        start = (page - 1) * page_size
+        page_rows = frame.iloc[start:start + page_size]
+        if len(frame) > page_size:
+            st.caption(f"Showing {start + 1}–{start + len(page_rows)} of {len(frame)}, sorted by score")
+        return page_rows
+
+    def render_candidate(i, row, verdict, deliveries):
+        # Widget keys are stable per candidate so notes and inputs survive reruns
+        card_key = f"{i}_{row['candidate_id']}"
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f"#### 👤 {row['name']}")
+            st.markdown(f"📧 **Email:** {row['email']} | 📞 **Phone:** {row['phone']}")
+            st.markdown(f"📌 **Fitment:** {row['fitment']}")
+            st.markdown(f"🔢 **Scores:** JD: {row['jd_similarity']} | Skills: {row['skills_match']} | Domain: {row['domain_match']} | Exp: {row['experience_match']} | Final: {row['score']}")
+
+            note_key = f"note_{card_key}"
+            verdict_key = f"verdict_{card_key}"
+            if note_key not in st.session_state:
+                st.session_state[note_key] = row["recruiter_notes"]
+            # The selectbox always shows the current verdict; a change is stored as an override
+            st.session_state[verdict_key] = row["verdict"]
+            st.text_area("📝 Recruiter Notes", key=note_key, on_change=record_note, args=(i, note_key))
+            st.selectbox("🔁 Override Verdict", VERDICTS, key=verdict_key,
+                         on_change=record_verdict_override, args=(i, verdict_key))
+
+        with col2:
+            # Summary PDFs are rendered and uploaded only when the candidate's content changes
+            candidate = hydrate(row)
+            pdf_key = summary_pdf_key(candidate)
+            summary_name = f"{row['name'].replace(' ', '_')}_{row['verdict'].capitalize()}.pdf"
+            # Keyed by candidate, so same-named candidates (e.g. "N/A") never overwrite each other
+            blob_name = f"{summary_name[:-4]}_{row['candidate_id'][:12]}.pdf"
+            uploaded_summaries = st.session_state.setdefault("uploaded_summaries", {})
+            if uploaded_summaries.get(row["candidate_id"]) != (blob_name, pdf_key):
+                save_summary_to_blob(get_summary_pdf(candidate, pdf_key), blob_name, AZURE_CONFIG["summaries_container"])
+                uploaded_summaries[row["candidate_id"]] = (blob_name, pdf_key)
+
+            if st.button(f"✉️ Send Email to {row.get('name', 'Candidate')}", key=f"email_button_{card_key}"):
+                if verdict == "shortlist":
+                    subject = "Congratulations! You have been shortlisted"
+                    body = f"Dear {row['name']},\n\nYou have been shortlisted for the role based on your profile. We will be in touch with next steps.\n\nBest,\nRecruitment Team"
+                elif verdict == "review":
+                    subject = "Information Required for your job application."
+                    missing_list = ", ".join(check_missing_info(row))
+                    body = f"""Dear {row['name']},\n\nThank you for your interest in the position.\n\nTo proceed with your application, we need the following missing information: {missing_list}.Please reply to this email with the required details at your earliest convenience.\n\nBest regards,\n\nRecruitment Team"""
+                else:
+                    subject = "Application Update"
+                    body = f"Dear {row['name']},\n\nThank you for your interest. At this time, we will not be moving forward with your application. We wish you the best in your future endeavors.\n\nRegards,\nRecruitment Team"
+                queue_email(row, f"{verdict}_email", subject, body)
+
+            # === Schedule Interview (Only for shortlisted candidates) ===
+            if verdict == "shortlist":
+                with st.expander("📅 Schedule Interview"):
+                    # Interview date input (default = tomorrow)
+                    interview_date = st.text_input(
+                        "Interview Date",
+                        value=(datetime.datetime.now() + timedelta(days=1)).date().isoformat(),
+                        key=f"interview_date_{card_key}"
+                    )
+
+                    # Interview time input (dropdown, 30 min intervals)
+                    interview_time = st.selectbox(
+                        "Interview Time",
+                        [f"{hour:02d}:{minute:02d}" for hour in range(9, 18) for minute in (0, 30)],
+                        key=f"interview_time_{card_key}"
+                    )
+
+                    if st.button("📅 Schedule Interview", key=f"schedule_{card_key}"):
+                        if not interview_date or not interview_time:
+                            st.warning("⚠️ Please enter both interview date and time.")
+                        else:
+                            _, status = outbox.enqueue("interview", row["recipient_id"], "interview", jd, {
+                                "email": row["email"],
+                                "name": row["name"],
+                                "date": interview_date.replace("-", "/"),
+                                "time": interview_time
+                            })
+                            if status == "sent":
+                                st.info("ℹ️ Interview already scheduled for this candidate.")
+                            else:
+                                st.success("📬 Interview invite queued.")
+
+            # Delivery status recorded by the outbox worker
+            for template, (status, detail) in deliveries.items():
+                label = template.replace("_", " ").capitalize()
+                st.caption(f"{DELIVERY_ICONS.get(status, '•')} {label}: {status}")
+                if template == "interview" and status == "sent" and detail:
+                    st.markdown(f"[Join Meet]({detail})", unsafe_allow_html=True)
+
+            st.download_button(
+                "📥 Download Summary",
+                data=lambda candidate=candidate, key=pdf_key: get_summary_pdf(candidate, key),
+                file_name=summary_name,
+                mime="application/pdf",
+                key=f"summary_{card_key}",
+                on_click="ignore"
+            )
 
-    
-    # tab_under_review, tab_shortlisted, tab_rejected = st.tabs(["Under Review", "Shortlisted", "Rejected"])
+    # Same rule as check_missing_info, evaluated column-wise over the whole frame
+    has_missing_info = (
+        df[REQUIRED_FIELDS].astype(str).apply(lambda col: col.str.strip().str.lower().isin(["", "n/a"])).any(axis=1)
+    )
 
     for verdict, tab in zip(["shortlist", "review", "reject"], tabs[:3]):
-        
+
         with tab:
             filtered = df[df["verdict"] == verdict]
             st.markdown(f"### {verdict.title()} Candidates ({len(filtered)})")
@@ -214,165 +592,101 @@ if st.session_state["candidate_df"] is not None:
                 if len(filtered) > 0:
                     st.markdown("#### ✉️ Bulk Rejection Email")
                     if st.button("📬 Send Rejection Emails to All"):
-                        seen_emails = set()
-                        for i, row in filtered.iterrows():
-                            contact = row.get("contact") or {}
-                            email = contact.get("email", "")
-                            if email in seen_emails:
-                                continue
-                            seen_emails.add(email)
-
-                            if email:
-                                subject = "Application Update"
-                                body = f"Dear {row['name']},\n\nThank you for your interest in the role. Unfortunately, we will not be proceeding with your application at this time.\n\nWe wish you success in your future endeavors.\n\nRegards,\nRecruitment Team"
-                                success = send_email(email, subject, body)
-                                if success:
-                                    st.success(f"Email sent to {row['name']} at {email}")
-                                else:
-                                    st.error(f"Failed to send email to {row['name']}")
-                            rejected_candidates = df[df['verdict'] == 'reject']
-                            if not rejected_candidates.empty:
-                                for _, row in rejected_candidates.iterrows():
-                                    if pd.notna(row.get('email', '')) and row['email'].strip():
-                                        subject = "Application Status"
-                                        body = f"Dear {row['name']},\n\nThank you for applying. Unfortunately, we are not proceeding with your application at this time.\n\nBest regards,\nRecruitment Team"
-                                        send_email(row['email'], subject, body)
-                                st.success("Bulk rejection emails sent.")
-                            else:
-                                st.warning("No rejected candidates to email.")
-                            # print(f"Bulk rejection button clicked")
-                            # print("Rejected Candidates:")
-                            # print(rejected_candidates)
+                        # Queued in the durable outbox: one email per distinct address, never twice per candidate
+                        subject = "Application Update"
+                        counts = outbox.enqueue_emails(
+                            ((recipient_id, email, subject,
+                              f"Dear {name},\n\nThank you for your interest in the role. Unfortunately, we will not be proceeding with your application at this time.\n\nWe wish you success in your future endeavors.\n\nRegards,\nRecruitment Team")
+                             for recipient_id, email, name in zip(filtered["recipient_id"], filtered["email"], filtered["name"])),
+                            "reject_email", jd
+                        )
+                        if counts["queued"]:
+                            st.success(f"📬 Rejection emails queued for {counts['queued']} candidates.")
+                        if counts["existing"]:
+                            st.info(f"ℹ️ {counts['existing']} candidates were already emailed or queued.")
+                        if counts["duplicate"] or counts["invalid"]:
+                            st.warning(f"Skipped {counts['duplicate']} duplicate and {counts['invalid']} missing/invalid addresses.")
                 else:
                     st.info("No rejected candidates to email.")
 
-        
-            for i, row in filtered.iterrows():
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.markdown(f"#### 👤 {row['name']}")
-                    st.markdown(f"📧 **Email:** {row['email']} | 📞 **Phone:** {row['phone']}")
-                    st.markdown(f"📌 **Fitment:** {row['fitment']}")
-                    st.markdown(f"🔢 **Scores:** JD: {row['jd_similarity']} | Skills: {row['skills_match']} | Domain: {row['domain_match']} | Exp: {row['experience_match']} | Final: {row['score']}")
-                    
-                    contact = row.get("contact", {}) or {}
-                    email = contact.get("email", "")
-                    email_part = row['email'] if pd.notna(row.get('email', '')) and row.get('email', '').strip() else f"noemail_{i}"
-                    # note_key = f"note_{i}_{row['name']}_{email_part}"
-                    note_key = f"note_{i}_{row['name']}_{row['email']}_{uuid.uuid4().hex}"
-
-                    #note_key = f"note_{i}_{row.get('name', '')}_{email}"
-                    verdict_key = f"verdict_{i}"
-
-                    if note_key not in st.session_state:
-                        st.session_state[note_key] = row["recruiter_notes"]
-                    if verdict_key not in st.session_state:
-                        st.session_state[verdict_key] = row["verdict"]
-                    new_note = st.text_area("📝 Recruiter Notes", value=st.session_state.get(note_key, ""), key=note_key)
-                    new_verdict = st.selectbox("🔁 Override Verdict", ["shortlist", "review", "reject"], index=["shortlist", "review", "reject"].index(st.session_state[verdict_key]), key=verdict_key)
-
-                    df.at[i, "recruiter_notes"] = new_note
-                    df.at[i, "verdict"] = new_verdict
-
-                with col2:
-                    pdf_bytes = generate_summary_pdf(row)
-                    summary_name = f"{row['name'].replace(' ', '_')}_{row['verdict'].capitalize()}.pdf"
-                    save_summary_to_blob(pdf_bytes, summary_name, AZURE_CONFIG["summaries_container"])
-                    to_email = (row.get("contact") or {}).get("email", "")
-                    with tabs[1]:
-                        # st.header("🕵️ Candidates Under Review")
-                        if not under_review:
-                            st.info("No candidates with missing information.")
-                        for i, row in enumerate(under_review):
-                            st.subheader(f"{row['name']}")
-
-                            missing = row.get("missing_info", [])
-                            if missing:
-                                st.warning(f"❗ Missing: {', '.join(missing)}")
-
-                            # Email logic
-                            if st.button(f"✉️ Send Request for Info - {row['email']}", key=f"underreview_{i}"):
-                                send_missing_info_email(row['email'], missing)  # You must define this function
-                                st.success("Email sent.")
-                    
-
-
-                    if st.button(f"✉️ Send Email to {row.get('name', 'Candidate')}", key=f"email_button_{i}_{email}"):
-                            if verdict == "shortlist":
-                                subject = "Congratulations! You have been shortlisted"
-                                body = f"Dear {row['name']},\n\nYou have been shortlisted for the role based on your profile. We will be in touch with next steps.\n\nBest,\nRecruitment Team"
-                                success = send_email(row['email'], subject, body)
-                                if success:
-                                    st.success(f"Email sent to {row['name']}")
-                                else:
-                                    st.error("Failed to send email.")
-                                    # === Schedule Interview (Only for shortlisted candidates) ===
-                                shortlisted_df = df[df["verdict"] == "shortlist"]
-                                for i, row in shortlisted_df.iterrows():
-                                    st.subheader(f"{row['name']} - {row['email']}")
-                                    default_dt = datetime.datetime.now() + datetime.timedelta(days=1)
-
-                                    # Interview date input (default = tomorrow)
-                                    interview_date = st.text_input(
-                                        f"Interview Date for {row["name"]}",
-                                        value=(datetime.datetime.now() + timedelta(days=1)).date().isoformat()
-                                    )
-
-                                    # Interview time input (dropdown, 30 min intervals)
-                                    interview_time = st.selectbox(
-                                        f"Interview Time for {row["name"]}",
-                                        [f"{hour:02d}:{minute:02d}" for hour in range(9, 18) for minute in (0, 30)]
-                                    )
-
-                                    if st.button(f"📅 Schedule Interview - {email}"):
-                                        st.write("🔄 Scheduling interview...")
-
-                                        if not interview_date or not interview_time:
-                                            st.warning("⚠️ Please enter both interview date and time.")
-                                        else:
-                                            try:
-                                                meet_link = schedule_interview(email, row["name"], interview_date.replace("-", "/"), interview_time)
-                                                if meet_link:
-                                                    st.success(f"✅ Interview Scheduled! Google Meet: {meet_link}")
-                                                    st.markdown(f"[Join Meet]({meet_link})", unsafe_allow_html=True)
-                                                else:
-                                                    st.warning("⚠️ Schedule function ran but did not return a meeting link.")
-                                            except Exception as e:
-                                                st.error(f"❌ Failed to schedule interview: {e}")
-
-
-                            elif verdict== "review":
-                                subject= "Information Required for your job application."
-                                missing_list = ", ".join(missing_info)
-                                body = f"""Dear {row['name']},\n\nThank you for your interest in the position.\n\nTo proceed with your application, we need the following missing information: {missing_list}.Please reply to this email with the required details at your earliest convenience.\n\nBest regards,\n\nRecruitment Team"""
-
-                                success = send_email(row['email'], subject, body)
-                                if success:
-                                    st.success(f"Missing info email sent to {row['name']}")
-                                else:
-                                    st.error(f"❌ Failed to send email to {row['name']}")
-                            else:
-                                subject = "Application Update"
-                                body = f"Dear {row['name']},\n\nThank you for your interest. At this time, we will not be moving forward with your application. We wish you the best in your future endeavors.\n\nRegards,\nRecruitment Team"
-        
-                                success = send_email(row['email'], subject, body)
-                                if success:
-                                    st.success(f"Email sent to {row['name']}")
-                                else:
-                                    st.error("Failed to send email.")
-
-                    b64 = base64.b64encode(pdf_bytes).decode()
-                    st.markdown(f'<a href="data:application/octet-stream;base64,{b64}" download="{summary_name}">📥 Download Summary</a>', unsafe_allow_html=True)
-
-            # CSV Export (no reprocessing)
+            if verdict == "shortlist" and len(filtered) > 0:
+                with st.expander("📅 Bulk Interview Scheduling"):
+                    first_day = st.date_input("First interview day",
+                                              value=(datetime.datetime.now() + timedelta(days=1)).date(),
+                                              min_value=datetime.date.today(), key="bulk_interview_day")
+                    if st.button("📅 Schedule All Shortlisted", key="bulk_interview_button"):
+                        # Consecutive 30-minute slots in score order, around interviews already booked;
+                        # the outbox worker inserts them through one Calendar batch request
+                        ranked = filtered.sort_values("score", ascending=False, kind="stable")
+                        booked = load_deliveries(ranked["recipient_id"])
+                        todo = [
+                            (recipient_id, email, name)
+                            for recipient_id, email, name in zip(ranked["recipient_id"], ranked["email"], ranked["name"])
+                            if normalize_recipient(email)
+                            and booked.get(recipient_id, {}).get("interview", ("failed", None))[0] == "failed"
+                        ]
+                        # Booking today starts from the next free slot, never one already past
+                        start = max(datetime.datetime.now(), datetime.datetime.combine(first_day, WORKDAY_START))
+                        slots = allocate_slots(todo, start, busy=outbox.scheduled_slots())
+                        for (recipient_id, email, name), start in slots:
+                            outbox.enqueue("interview", recipient_id, "interview", jd, {
+                                "email": email,
+                                "name": name,
+                                "date": start.strftime("%Y/%m/%d"),
+                                "time": start.strftime("%H:%M")
+                            })
+                        if slots:
+                            st.success(f"📬 {len(slots)} interviews queued: {slots[0][1]:%d %b %H:%M} – {slots[-1][1]:%d %b %H:%M}")
+                        skipped = len(filtered) - len(slots)
+                        if skipped:
+                            st.info(f"ℹ️ {skipped} candidates skipped (already scheduled or no email address).")
+
+            if verdict == "review":
+                # Candidates with missing contact details, listed once (and paginated) for the whole run
+                st.markdown("#### 🕵️ Missing Contact Information")
+                incomplete = df[has_missing_info]
+                if incomplete.empty:
+                    st.info("No candidates with missing information.")
+                for i, row in paginate(incomplete, "page_missing_info").iterrows():
+                    st.subheader(f"{row['name']}")
+
+                    missing = check_missing_info(row)
+                    if missing:
+                        st.warning(f"❗ Missing: {', '.join(missing)}")
+
+                    # Email logic
+                    if st.button(f"✉️ Send Request for Info - {row['email']}", key=f"underreview_{i}_{row['candidate_id']}",
+                                 disabled="email" in missing):
+                        request_missing_info(row, missing)
+                st.markdown("---")
+
+            page_rows = paginate(filtered, f"page_{verdict}")
+            page_deliveries = load_deliveries(page_rows["recipient_id"])
+            for i, row in page_rows.iterrows():
+                render_candidate(i, row, verdict, page_deliveries.get(row["recipient_id"], {}))
+
+            # CSV Export — serialized and uploaded only when candidates or verdicts change
             export_df = filtered.drop(columns=["resume_text"], errors="ignore")
             csv_name = f"{verdict}_export_{datetime.datetime.now().strftime('%Y-%m-%d')}.csv"
-            save_csv_to_blob(export_df, csv_name, AZURE_CONFIG["csv_container"])
-            st.download_button("📤 Download CSV", export_df.to_csv(index=False), file_name=csv_name)
+            export_csv_if_changed(export_df, csv_name, AZURE_CONFIG["csv_container"],
+                                  st.session_state.setdefault("exports", {}))
+            st.download_button("📤 Download CSV", data=lambda export_df=export_df: to_csv_text(export_df),
+                               file_name=csv_name, mime="text/csv", key=f"csv_{verdict}", on_click="ignore")
 
     # ========== Analytics Tab ==========
     with tabs[3]:
         st.dataframe(df.drop(columns=["resume_text", "embedding"], errors="ignore"))
+
+        # Columnar export of the whole run for downstream analytics
+        run_name = f"screening_run_{datetime.datetime.now().strftime('%Y-%m-%d')}.parquet"
+        run_df = df.drop(columns=["resume_text", "embedding"], errors="ignore")
+        export_parquet_if_changed(run_df, run_name, AZURE_CONFIG["csv_container"],
+                                  st.session_state.setdefault("exports", {}))
+        if PARQUET_AVAILABLE:
+            st.download_button("🧱 Download Run (Parquet)", data=lambda: to_parquet_bytes(run_df), file_name=run_name,
+                               mime="application/vnd.apache.parquet", key="parquet_run", on_click="ignore")
+        else:
+            st.caption("Install pyarrow to enable the Parquet export.")
         st.subheader("📊 Analytics Dashboard")
         st.markdown("#### Verdict Breakdown")
         st.bar_chart(df["verdict"].value_counts())
@@ -380,10 +694,23 @@ if st.session_state["candidate_df"] is not None:
         st.markdown("#### Score Distribution")
         st.line_chart(df[["jd_similarity", "skills_match", "domain_match", "experience_match", "score"]])
 
+        called = df[df["prompt_tokens"] > 0] if "prompt_tokens" in df else df.iloc[:0]
+        if not called.empty:
+            st.markdown("#### 🧾 Deep Evaluation Usage per Candidate")
+            st.dataframe(called[["name", "prompt_tokens", "cached_tokens", "completion_tokens", "eval_latency"]]
+                         .sort_values("prompt_tokens", ascending=False), hide_index=True)
+
         flagged = df[df["fraud_detected"] == True]
         if not flagged.empty:
             st.markdown("#### 🚨 Fraud/Red Flags")
-            st.dataframe(flagged[["name", "red_flags", "missing_gaps"]])
+            st.dataframe(attach_list_fields(flagged)[["name", "red_flags", "missing_gaps"]])
         else:
             st.success("✅ No fraud or red flags.")
 
+        dup_df = st.session_state.get("duplicates")
+        if dup_df is not None and not dup_df.empty:
+            st.markdown(f"#### 🧬 Duplicate Resumes ({len(dup_df)})")
+            st.caption("Linked to the evaluation of the resume they duplicate; not screened again.")
+            st.dataframe(dup_df[["resume_file", "duplicate_of", "dedup_match", "dedup_similarity", "name", "email"]],
+                         hide_index=True)
+
@@ -1,9 +1,17 @@
 # backend.py — GPT Evaluator + Role Extractor
 
 import json
+import time
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from constants import AZURE_CONFIG, MODEL_CONFIG, WEIGHTS, STRICT_GPT_PROMPT
-from openai import AzureOpenAI
-from utils import chunk_text
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from utils import get_embedding_cached, EVAL_RESUME_TOKENS
+from rate_limiter import get_rate_limiter, estimate_tokens
+from prompt_budget import build_eval_messages, EVAL_JD_TOKENS, EVAL_CRITERIA_TOKENS, EVAL_MAX_OUTPUT_TOKENS
+import eval_cache
+from storage import content_hash
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
@@ -14,6 +22,35 @@ client = AzureOpenAI(
     azure_endpoint=AZURE_CONFIG["azure_endpoint"]
 )
 
+# Bump EVAL_PROMPT_VERSION whenever the evaluation message layout changes so cached
+# evaluations from the old layout are not reused
+EVAL_PROMPT_VERSION = "v2-" + content_hash(
+    STRICT_GPT_PROMPT.strip(), EVAL_JD_TOKENS, EVAL_CRITERIA_TOKENS, EVAL_RESUME_TOKENS
+)[:12]
+
+# Async GPT client — one per event loop, since its HTTP pool is bound to the loop.
+# Retries are handled by rate_limiter so 429s back off across all in-flight calls.
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncAzureOpenAI(
+            api_key=AZURE_CONFIG["openai_key"],
+            api_version=AZURE_CONFIG["api_version"],
+            azure_endpoint=AZURE_CONFIG["azure_endpoint"],
+            max_retries=0
+        )
+        _async_clients[loop] = async_client
+    return async_client
+
+async def close_async_client():
+    # Await before the loop closes: releases the client's HTTP connections bound to this loop
+    async_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if async_client is not None:
+        await async_client.close()
+
 # ========== JD Role Extractor ==========
 def extract_role_from_jd(jd_text: str) -> str:
     try:
@@ -40,6 +77,56 @@ Job Description:
     except Exception:
         return "N/A"
 
+def extract_role_from_jd_cached(jd_text: str) -> str:
+    # Persistent by JD hash; "N/A" is not cached since it may be a transient failure
+    key = eval_cache.role_key(jd_text, MODEL_CONFIG["fast_gpt_model"])
+    role = eval_cache.get_role(key)
+    if role is None:
+        role = extract_role_from_jd(jd_text)
+        if role != "N/A":
+            eval_cache.put_role(key, role)
+    return role
+
+# ========== JD Preparation (role + embedding in parallel) ==========
+def prepare_jd(jd_text: str):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        role_future = executor.submit(extract_role_from_jd_cached, jd_text)
+        embedding_future = executor.submit(get_embedding_cached, jd_text)
+        return role_future.result(), embedding_future.result()
+
+# ========== Async Fast Triage (cascade stage 1) ==========
+async def triage_resume_async(jd: str, resume_text: str, role: str):
+    # Cheap fast_gpt_model fit score (0–100) used to prune before the deep evaluation
+    try:
+        messages = [{"role": "user", "content": f"""
+You are screening resumes for the role "{role}". Rate from 0 to 100 how well the resume fits the job description.
+Reply with the number only.
+
+Job Description:
+\"\"\"
+{jd[:2000]}
+\"\"\"
+
+Resume:
+\"\"\"
+{resume_text[:3000]}
+\"\"\"
+"""}]
+        async_client = get_async_client()
+        response = await get_rate_limiter().run(
+            lambda: async_client.chat.completions.create(
+                model=MODEL_CONFIG["fast_gpt_model"],
+                messages=messages,
+                temperature=0,
+                max_tokens=5,
+            ),
+            estimate_tokens(messages) + 5
+        )
+        score = float(response.choices[0].message.content.strip().split()[0])
+        return max(0.0, min(100.0, score))
+    except Exception:
+        return None
+
 # ========== Async Resume Evaluator ==========
 async def get_resume_analysis_async(
     jd: str,
@@ -50,44 +137,77 @@ async def get_resume_analysis_async(
     skills: str,
     experience_range: str,
     jd_similarity: float,
-    resume_file: str
+    resume_file: str,
+    refresh_cache: bool = False,
+    resume_tokens=None
 ) -> dict:
     try:
-        chunks = chunk_text(resume_text)
-        combined_text = "\n\n".join(chunks[:3])  # ~3000 tokens
-
-        messages = [
-            {"role": "system", "content": STRICT_GPT_PROMPT.strip()},
-            {"role": "user", "content": f"""
-JD: {jd}
+        cache_key = eval_cache.evaluation_key(
+            jd, resume_text, role, domain, skills, experience_range,
+            EVAL_PROMPT_VERSION, MODEL_CONFIG["deep_gpt_model"]
+        )
+        if not refresh_cache:
+            cached_raw = eval_cache.get(cache_key)
+            if cached_raw is not None:
+                result = parse_gpt_response(cached_raw, contact, role, jd_similarity, resume_text, resume_file)
+                # Entries cached before answers were validated may not parse; ask again instead
+                if not result.get("evaluation_failed"):
+                    result["eval_cache_hit"] = True
+                    return result
 
-ROLE: {role}
-DOMAIN: {domain}
-REQUIRED SKILLS: {skills}
-EXPERIENCE RANGE: {experience_range}
+        # System prompt, JD and criteria first (a stable prefix shared by the whole batch),
+        # resume last; every section is capped by prompt_budget
+        messages, prompt_sections = build_eval_messages(
+            jd, role, domain, skills, experience_range, resume_text, resume_tokens
+        )
+        async_client = get_async_client()
 
-RESUME:
-{combined_text}
-"""}
-        ]
+        async def timed_call():
+            # Latency of the successful request itself, not the time spent queued or backing off
+            started = time.perf_counter()
+            response = await async_client.chat.completions.create(
+                model=MODEL_CONFIG["deep_gpt_model"],
+                messages=messages,
+                temperature=0.2,
+                max_tokens=EVAL_MAX_OUTPUT_TOKENS
+            )
+            return response, time.perf_counter() - started
 
-        response = client.chat.completions.create(
-            model=MODEL_CONFIG["deep_gpt_model"],
-            messages=messages,
-            temperature=0.2,
-            max_tokens=1200
+        response, latency = await get_rate_limiter().run(
+            timed_call, prompt_sections["total"] + EVAL_MAX_OUTPUT_TOKENS
         )
 
         raw = response.choices[0].message.content
-        return parse_gpt_response(raw, contact, role, jd_similarity, resume_text, resume_file)
+        result = parse_gpt_response(raw, contact, role, jd_similarity, resume_text, resume_file)
+        if not result.get("evaluation_failed"):
+            # Only answers that parse into an evaluation are cached; failures retry on the next run
+            eval_cache.put(cache_key, raw, MODEL_CONFIG["deep_gpt_model"])
+        result["eval_cache_hit"] = False
+        result.update(usage_fields(response, latency))
+        result["prompt_sections"] = prompt_sections
+        return result
 
     except Exception as e:
         return failed_json(contact, role, jd_similarity, resume_text, resume_file, reason=str(e))
 
+# ========== Per-Call Token Usage ==========
+def usage_fields(response, latency):
+    # Provider-reported token counts; cached_tokens is the part served from the prompt cache
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "eval_latency": round(latency, 3)
+    }
+
 # ========== GPT Response Parser ==========
 def parse_gpt_response(raw_json, contact, role, jd_similarity, resume_text, resume_file):
     try:
         parsed = json.loads(raw_json)
+        if not isinstance(parsed, dict):
+            raise ValueError("not a JSON object")
     except:
         return failed_json(contact, role, jd_similarity, resume_text, resume_file, reason="❌ GPT parsing failed")
 
@@ -137,10 +257,24 @@ def parse_gpt_response(raw_json, contact, role, jd_similarity, resume_text, resu
         "recommendation": get("recommendation", "N/A"),
         "highlights": get("highlights", []),
         "verdict": verdict,
+        "gpt_verdict": get("verdict", "review"),
         "resume_text": resume_text,
         "resume_file": resume_file
     }
 
+# ========== Record for Candidates Pruned by the Cascade ==========
+def skipped_json(contact, role, jd_similarity, resume_text, resume_file, reason):
+    result = failed_json(contact, role, jd_similarity, resume_text, resume_file, reason=f"⏭️ Skipped by prefilter: {reason}")
+    result.update({
+        "red_flags": [],
+        "missing_gaps": [],
+        "fraud_detected": False,
+        "reasons_if_rejected": [reason],
+        "prefiltered": True,
+        "evaluation_failed": False
+    })
+    return result
+
 # ========== Fallback on GPT Failure ==========
 def failed_json(contact, role, jd_similarity, resume_text, resume_file, reason="GPT error"):
     return {
@@ -162,6 +296,8 @@ def failed_json(contact, role, jd_similarity, resume_text, resume_file, reason="
         "recommendation": "N/A",
         "highlights": [],
         "verdict": "reject",
+        "gpt_verdict": "reject",
         "resume_text": resume_text,
-        "resume_file": resume_file
+        "resume_file": resume_file,
+        "evaluation_failed": True
     }
@@ -0,0 +1,127 @@
+# blob_uploader.py — Background, Pooled, Deduplicated Azure Blob Uploads
+
+import atexit
+import hashlib
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from azure.core.exceptions import ResourceNotFoundError, ResourceExistsError
+from azure.storage.blob import BlobServiceClient, ContentSettings
+from constants import AZURE_CONFIG
+
+UPLOAD_WORKERS = AZURE_CONFIG.get("upload_workers", 8)
+# Longest an exiting process waits for queued uploads before giving up on them
+SHUTDOWN_TIMEOUT = AZURE_CONFIG.get("upload_shutdown_timeout", 30)
+
+class BlobUploader:
+    """
+    Uploads run on a bounded thread pool through one ContainerClient per container.
+    Content whose MD5 already matches the stored blob is skipped, both from an
+    in-process record and from the blob's Content-MD5 property. Works against the
+    Azurite emulator with conn_str="UseDevelopmentStorage=true".
+    """
+
+    def __init__(self, conn_str=None, max_workers=UPLOAD_WORKERS):
+        self.conn_str = conn_str or AZURE_CONFIG["connection_string"]
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blob-upload")
+        # self.lock guards only in-memory state and is never held during network I/O;
+        # container setup is serialized per container with its own lock
+        self.lock = threading.Lock()
+        self.container_locks = {}
+        self.service = None
+        self.containers = {}
+        self.uploaded_md5 = {}
+        self.pending = set()
+        self.errors = []
+        self.stats = {"uploaded": 0, "skipped": 0, "failed": 0}
+
+    def _container(self, container):
+        client = self.containers.get(container)
+        if client is not None:
+            return client
+        with self.lock:
+            if self.service is None:
+                self.service = BlobServiceClient.from_connection_string(self.conn_str)
+            container_lock = self.container_locks.setdefault(container, threading.Lock())
+        with container_lock:
+            client = self.containers.get(container)
+            if client is None:
+                client = self.service.get_container_client(container)
+                try:
+                    client.create_container()
+                except ResourceExistsError:
+                    pass
+                except Exception:
+                    pass  # no create permission — the container is expected to exist
+                self.containers[container] = client
+            return client
+
+    def submit(self, data, blob_name, container):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        md5 = hashlib.md5(data).digest()
+        if self.uploaded_md5.get((container, blob_name)) == md5:
+            self.stats["skipped"] += 1
+            done = Future()
+            done.set_result(False)
+            return done
+
+        future = self.executor.submit(self._upload, data, blob_name, container, md5)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self.lock:
+            self.pending.discard(future)
+
+    def _upload(self, data, blob_name, container, md5):
+        try:
+            blob = self._container(container).get_blob_client(blob_name)
+            try:
+                remote_md5 = blob.get_blob_properties().content_settings.content_md5
+                if remote_md5 and bytes(remote_md5) == md5:
+                    self.uploaded_md5[(container, blob_name)] = md5
+                    self.stats["skipped"] += 1
+                    return False
+            except ResourceNotFoundError:
+                pass
+
+            content_type = mimetypes.guess_type(blob_name)[0] or "application/octet-stream"
+            blob.upload_blob(
+                data,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=content_type, content_md5=bytearray(md5))
+            )
+            self.uploaded_md5[(container, blob_name)] = md5
+            self.stats["uploaded"] += 1
+            return True
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.errors.append((container, blob_name, str(e)))
+            print(f"❌ Blob upload failed for {container}/{blob_name}: {e}")
+            return False
+
+    def flush(self, timeout=None):
+        with self.lock:
+            pending = list(self.pending)
+        wait(pending, timeout=timeout)
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        # Bounded so an unreachable storage endpoint cannot hang process exit
+        self.flush(timeout=timeout)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+def get_uploader():
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = BlobUploader()
+            # Give queued uploads up to SHUTDOWN_TIMEOUT to finish when the server process shuts down
+            atexit.register(_uploader.close)
+        return _uploader
@@ -0,0 +1,174 @@
+# candidate_store.py — Compact Columnar Candidate Store + Lazy Side Store
+
+import json
+import time
+import functools
+import numpy as np
+import pandas as pd
+from storage import open_db, content_hash
+from scoring import SUBSCORE_COLUMNS, VERDICTS
+from mailer import normalize_recipient
+
+DB_NAME = "candidate_details.sqlite"
+
+# Heavy per-candidate fields kept out of session_state and loaded on demand
+LIST_FIELDS = ["red_flags", "missing_gaps", "reasons_if_rejected", "highlights"]
+TEXT_FIELDS = ["name", "email", "phone", "fitment", "summary_5_lines", "recommendation", "resume_file"]
+EDITABLE_FIELDS = ["recruiter_notes", "verdict_override"]
+CATEGORY_FIELDS = ["jd_role"]
+# Per-call deep evaluation usage; 0 when no call was made (cache hit, skipped, failed)
+USAGE_FIELDS = ["prompt_tokens", "completion_tokens", "cached_tokens", "eval_latency"]
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS details ("
+    " candidate_id TEXT PRIMARY KEY, resume_text TEXT, list_fields TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS deliveries ("
+    " candidate_id TEXT NOT NULL, template TEXT NOT NULL, status TEXT NOT NULL,"
+    " detail TEXT, updated REAL NOT NULL, PRIMARY KEY (candidate_id, template))",
+)
+
+def _open():
+    return open_db(DB_NAME, SCHEMA)
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [] if value in (None, "", "N/A") else [value]
+
+def recipient_id(email, resume_text):
+    # Stable across re-evaluations (unlike candidate_id, which hashes the GPT output), so
+    # outbox idempotency and delivery statuses follow the person, not one evaluation
+    recipient = normalize_recipient(email)
+    return content_hash("email", recipient) if recipient else content_hash("resume", resume_text or "")
+
+def _clean_text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "N/A"
+    return str(value).replace("n/a", "N/A")
+
+# ==========================
+# 🧱 Build the Compact Frame
+# ==========================
+def build_candidate_frame(results):
+    """
+    Turn candidate dicts (parse_gpt_response / failed_json) into a typed frame:
+    float32 scores, categorical verdicts/roles, and a candidate_id handle.
+    resume_text and list fields go to the on-disk side store.
+    """
+    rows, details = [], []
+    for r in results:
+        lists = {f: _as_list(r.get(f)) for f in LIST_FIELDS}
+        # Content-addressed so identical candidates across sessions share one side-store row
+        candidate_id = content_hash(r.get("resume_file"), content_hash(r.get("resume_text", "")),
+                                    json.dumps(lists, sort_keys=True, default=str))
+        details.append((candidate_id, r.get("resume_text", ""), json.dumps(lists, default=str)))
+
+        row = {"candidate_id": candidate_id, "recipient_id": recipient_id(r.get("email"), r.get("resume_text"))}
+        for f in TEXT_FIELDS:
+            row[f] = _clean_text(r.get(f))
+        for f in EDITABLE_FIELDS:
+            row[f] = str(r.get(f) or "")
+        for f in CATEGORY_FIELDS:
+            row[f] = _clean_text(r.get(f))
+        for f in SUBSCORE_COLUMNS + ["score"] + USAGE_FIELDS:
+            row[f] = r.get(f, 0)
+        row["verdict"] = r.get("verdict", "review")
+        row["gpt_verdict"] = r.get("gpt_verdict", r.get("verdict", "review"))
+        row["fraud_detected"] = bool(r.get("fraud_detected", False))
+        row["has_red_flags"] = bool(lists["red_flags"])
+        for flag in ("eval_cache_hit", "prefiltered"):
+            row[flag] = bool(r.get(flag, False))
+        rows.append(row)
+
+    if details:
+        with _open() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO details (candidate_id, resume_text, list_fields) VALUES (?, ?, ?)", details
+            )
+
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    for f in SUBSCORE_COLUMNS + ["score"] + USAGE_FIELDS:
+        df[f] = pd.to_numeric(df[f], errors="coerce").fillna(0).astype(np.float32)
+    for f in ("verdict", "gpt_verdict"):
+        df[f] = pd.Categorical(df[f].astype(str), categories=VERDICTS)
+    for f in CATEGORY_FIELDS:
+        df[f] = df[f].astype("category")
+    return df
+
+def concat_candidate_frames(frames):
+    # Frames built incrementally (one per streamed batch) → one frame with the same dtypes
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for f in ("verdict", "gpt_verdict"):
+        df[f] = pd.Categorical(df[f].astype(str), categories=VERDICTS)
+    for f in CATEGORY_FIELDS:
+        df[f] = df[f].astype(str).astype("category")
+    return df
+
+# ==========================
+# 🔎 Lazy Side-Store Access
+# ==========================
+@functools.lru_cache(maxsize=4096)
+def load_details(candidate_id):
+    # List fields only (small); cached per process, shared by every session
+    with _open() as conn:
+        row = conn.execute("SELECT list_fields FROM details WHERE candidate_id = ?", (candidate_id,)).fetchone()
+    return json.loads(row[0]) if row else {f: [] for f in LIST_FIELDS}
+
+def load_resume_text(candidate_id):
+    with _open() as conn:
+        row = conn.execute("SELECT resume_text FROM details WHERE candidate_id = ?", (candidate_id,)).fetchone()
+    return row[0] if row else ""
+
+def hydrate(row, include_text=False):
+    # Full candidate dict for one row (PDFs, emails); resume text only when asked for
+    candidate = dict(row)
+    details = load_details(candidate["candidate_id"])
+    for f in LIST_FIELDS:
+        candidate[f] = list(details.get(f, []))
+    if include_text:
+        candidate["resume_text"] = load_resume_text(candidate["candidate_id"])
+    return candidate
+
+def attach_list_fields(df):
+    # Adds the list columns to a (small, or change-driven) frame for exports
+    out = df.copy()
+    detail_rows = [load_details(cid) for cid in out["candidate_id"]]
+    for f in LIST_FIELDS:
+        out[f] = [d.get(f, []) for d in detail_rows]
+    return out
+
+# ==========================
+# 📬 Delivery Status (written by the outbox worker)
+# ==========================
+def record_deliveries(entries):
+    # entries: iterable of (recipient_id, template, status, detail); the column keeps its old name
+    now = time.time()
+    with _open() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO deliveries (candidate_id, template, status, detail, updated) VALUES (?, ?, ?, ?, ?)",
+            [(candidate_id, template, status, detail, now) for candidate_id, template, status, detail in entries]
+        )
+
+def record_delivery(candidate_id, template, status, detail=None):
+    record_deliveries([(candidate_id, template, status, detail)])
+
+def load_deliveries(candidate_ids):
+    # {recipient_id: {template: (status, detail)}} for one page of candidates
+    candidate_ids = list(candidate_ids)
+    if not candidate_ids:
+        return {}
+    placeholders = ",".join("?" * len(candidate_ids))
+    with _open() as conn:
+        rows = conn.execute(
+            f"SELECT candidate_id, template, status, detail FROM deliveries WHERE candidate_id IN ({placeholders})",
+            candidate_ids
+        ).fetchall()
+    deliveries = {}
+    for candidate_id, template, status, detail in rows:
+        deliveries.setdefault(candidate_id, {})[template] = (status, detail)
+    return deliveries
@@ -0,0 +1,139 @@
+# cascade.py — Two-Stage Screening: cheap prefilter before the deep GPT model
+
+import time
+import asyncio
+from constants import MODEL_CONFIG
+
+# Defaults (overridable in MODEL_CONFIG); 0 / False disables a stage
+CASCADE_MIN_SIMILARITY = MODEL_CONFIG.get("cascade_min_similarity", 0)
+CASCADE_TOP_K = MODEL_CONFIG.get("cascade_top_k", 0)
+CASCADE_TRIAGE = MODEL_CONFIG.get("cascade_triage", False)
+CASCADE_TRIAGE_MIN = MODEL_CONFIG.get("cascade_triage_min", 40)
+
+def new_stats():
+    return {
+        "stage1": 0,
+        "pruned_similarity": 0,
+        "pruned_triage": 0,
+        "pruned_top_k": 0,
+        "triage_calls": 0,
+        "deep": 0,
+        "deep_fresh": 0,
+        "deep_seconds": 0.0
+    }
+
+async def iter_cascade(stage1_stream, deep_evaluate, skip, triage=None,
+                       min_similarity=0, top_k=0, triage_min=0, stats=None):
+    """
+    stage1_stream: async iterator of candidate dicts carrying "jd_similarity" (0–100)
+    deep_evaluate(candidate): coroutine returning the full candidate record
+    skip(candidate, reason): returns a failed_json-style record for pruned candidates
+    triage(candidate): optional coroutine returning a 0–100 fast-model score (or None)
+
+    Yields every candidate record as soon as it is final, in completion order.
+    With only a similarity cutoff, survivors start their deep evaluation immediately
+    and finished evaluations are yielded while stage 1 is still running.
+    Triage and top-K need the whole stage-1 pool, so those wait for the stream to end.
+    """
+    stats = stats if stats is not None else new_stats()
+    running, waiting = set(), []
+
+    async def timed_deep(candidate):
+        started = time.perf_counter()
+        result = await deep_evaluate(candidate)
+        if not result.get("eval_cache_hit"):
+            stats["deep_fresh"] += 1
+            stats["deep_seconds"] += time.perf_counter() - started
+        return result
+
+    def start_deep(candidate):
+        stats["deep"] += 1
+        running.add(asyncio.ensure_future(timed_deep(candidate)))
+
+    streaming = not top_k and triage is None
+    stage1 = stage1_stream.__aiter__()
+    next_candidate = asyncio.ensure_future(stage1.__anext__())
+    try:
+        # Stage 1 and (in streaming mode) stage 2 interleave: whichever finishes first is handled first
+        while next_candidate is not None:
+            done, _ = await asyncio.wait(running | {next_candidate}, return_when=asyncio.FIRST_COMPLETED)
+            for task in done - {next_candidate}:
+                running.discard(task)
+                yield task.result()
+            if next_candidate not in done:
+                continue
+            try:
+                candidate = next_candidate.result()
+            except StopAsyncIteration:
+                next_candidate = None
+                break
+            next_candidate = asyncio.ensure_future(stage1.__anext__())
+
+            stats["stage1"] += 1
+            if candidate["jd_similarity"] < min_similarity:
+                stats["pruned_similarity"] += 1
+                yield skip(candidate, f"JD similarity {candidate['jd_similarity']} below prefilter cutoff {min_similarity}")
+            elif streaming:
+                start_deep(candidate)
+            else:
+                waiting.append(candidate)
+
+        if waiting and triage is not None:
+            stats["triage_calls"] += len(waiting)
+            scores = await asyncio.gather(*(triage(c) for c in waiting))
+            survivors = []
+            for candidate, score in zip(waiting, scores):
+                candidate["triage_score"] = score
+                # A failed triage call never prunes on its own
+                if score is not None and score < triage_min:
+                    stats["pruned_triage"] += 1
+                    yield skip(candidate, f"Fast triage score {score:.0f} below {triage_min}")
+                else:
+                    survivors.append(candidate)
+            waiting = survivors
+
+        if waiting:
+            ranked = sorted(
+                waiting,
+                key=lambda c: c["triage_score"] if c.get("triage_score") is not None else c["jd_similarity"],
+                reverse=True
+            )
+            keep = ranked[:top_k] if top_k else ranked
+            for candidate in keep:
+                start_deep(candidate)
+            for candidate in ranked[len(keep):]:
+                stats["pruned_top_k"] += 1
+                yield skip(candidate, f"Not in prefilter top {top_k}")
+
+        while running:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Consumer stopped early: don't leave evaluations running on the loop
+        if next_candidate is not None:
+            next_candidate.cancel()
+        for task in running:
+            task.cancel()
+
+async def run_cascade(stage1_stream, deep_evaluate, skip, triage=None,
+                      min_similarity=0, top_k=0, triage_min=0, stats=None):
+    # Collects iter_cascade's records into a list (completion order)
+    return [
+        record async for record in iter_cascade(
+            stage1_stream, deep_evaluate, skip, triage=triage, min_similarity=min_similarity,
+            top_k=top_k, triage_min=triage_min, stats=stats
+        )
+    ]
+
+def summarize(stats):
+    pruned = stats["pruned_similarity"] + stats["pruned_triage"] + stats["pruned_top_k"]
+    line = (
+        f"Stage 1: {stats['stage1']} screened · pruned {pruned} "
+        f"(similarity {stats['pruned_similarity']}, triage {stats['pruned_triage']}, top-K {stats['pruned_top_k']}) · "
+        f"Stage 2: {stats['deep']} deep evaluations"
+    )
+    if pruned and stats["deep_fresh"]:
+        avg = stats["deep_seconds"] / stats["deep_fresh"]
+        line += f" · saved ~{pruned} deep calls (~{pruned * avg:.0f}s of model time)"
+    return line
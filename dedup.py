@@ -0,0 +1,114 @@
+# dedup.py — Exact and Near-Duplicate Resume Detection (content hash + MinHash LSH)
+
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+from constants import MODEL_CONFIG
+from storage import content_hash
+
+# Estimated Jaccard similarity of word shingles at or above which two resumes are one candidate
+NEAR_DUP_THRESHOLD = MODEL_CONFIG.get("dedup_near_threshold", 0.9)
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS, ROWS = 16, 8          # BANDS * ROWS == NUM_PERM
+# Texts shorter than this (failed or near-empty parses) are never treated as duplicates
+MIN_WORDS = 20
+
+_WORD = re.compile(r"\w+")
+_PRIME = (1 << 31) - 1       # keeps a * x + b inside uint64
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, NUM_PERM).astype(np.uint64)
+
+def normalize_words(text):
+    # Case, punctuation and layout differences (re-exported PDFs, other templates) do not count
+    return _WORD.findall((text or "").lower())
+
+def minhash(words):
+    if len(words) < SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)) % _PRIME
+    return ((x[:, None] * _A + _B) % _PRIME).min(axis=0)
+
+def _email(value):
+    value = str(value or "").strip().lower()
+    return value if "@" in value else ""
+
+class DedupIndex:
+    """
+    Spots resumes already seen in this batch. Exact duplicates share the hash of their
+    normalized text; near duplicates are found through MinHash LSH buckets and confirmed
+    on the full signature. Two resumes with different email addresses are never merged.
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD):
+        self.threshold = threshold
+        self.exact = {}                     # normalized-text hash → canonical item
+        self.signatures = {}                # canonical item → MinHash signature
+        self.emails = {}
+        self.buckets = defaultdict(list)    # (band, band signature) → canonical items
+        self.stats = {"exact": 0, "near": 0}
+
+    def add(self, item, text, email=None):
+        # Register a canonical resume (e.g. restored from a checkpoint) without checking it
+        words = normalize_words(text)
+        if len(words) >= MIN_WORDS:
+            self._register(item, words, content_hash(" ".join(words)), email)
+
+    def check(self, item, text, email=None):
+        """
+        Returns (canonical_item, "exact" | "near", similarity) if the resume duplicates one
+        already seen; otherwise registers it as canonical and returns None.
+        """
+        words = normalize_words(text)
+        if len(words) < MIN_WORDS:
+            return None
+        key = content_hash(" ".join(words))
+        if key in self.exact:
+            self.stats["exact"] += 1
+            return self.exact[key], "exact", 1.0
+
+        signature = minhash(words)
+        email = _email(email)
+        candidates = {c for band, part in self._bands(signature) for c in self.buckets.get((band, part), ())}
+        best, best_similarity = None, 0.0
+        for canonical in candidates:
+            other_email = self.emails.get(canonical)
+            if email and other_email and email != other_email:
+                continue
+            similarity = float(np.mean(self.signatures[canonical] == signature))
+            if similarity > best_similarity:
+                best, best_similarity = canonical, similarity
+        if best is not None and best_similarity >= self.threshold:
+            self.stats["near"] += 1
+            return best, "near", best_similarity
+
+        self._register(item, words, key, email, signature)
+        return None
+
+    def _register(self, item, words, key, email, signature=None):
+        self.exact.setdefault(key, item)
+        if signature is None:
+            signature = minhash(words)
+        self.signatures[item] = signature
+        self.emails[item] = _email(email)
+        for band in self._bands(signature):
+            self.buckets[band].append(item)
+
+    @staticmethod
+    def _bands(signature):
+        return [(b, signature[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+
+def duplicate_record(item, canonical, match, similarity, contact):
+    # A link to the canonical candidate's evaluation, stored instead of a second evaluation
+    return {
+        "resume_file": item,
+        "duplicate_of": canonical,
+        "dedup_match": match,
+        "dedup_similarity": round(similarity, 3),
+        "name": contact.get("name", "N/A"),
+        "email": contact.get("email", "N/A")
+    }
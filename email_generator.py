@@ -1,30 +1,19 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import pandas as pd
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 import datetime
+from mailer import get_mailer
 
 def send_email(to_email, subject, body):
-    from_email = "prishabadwaik812@gmail.com"
-    password = "yljkxbxtfkdjboli"  # App password, NOT your Gmail password
+    # Reuses the shared pooled SMTP connection instead of logging in per message
+    return get_mailer().send(to_email, subject, body)["status"] == "sent"
 
-    message = MIMEMultipart()
-    message["From"] = from_email
-    message["To"] = to_email
-                            #to_email= row['email']
-    message["Subject"] = subject
-    message.attach(MIMEText(body, "plain"))
-
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(from_email, password)
-            server.sendmail(from_email, to_email, message.as_string())
-        return True
-    except Exception as e:
-        print("Failed to send email: ", e)
-        return False
+def send_bulk_emails(messages):
+    """
+    messages: iterable of (to_email, subject, body). Recipients are deduplicated and
+    sends are throttled; returns one outcome dict per message (see mailer.BulkMailer).
+    """
+    return get_mailer().send_bulk(messages)
                         
 def check_missing_info(row):
     missing_fields = []
@@ -45,8 +34,6 @@ def check_missing_info(row):
 
     
 def send_missing_info_email(to_email, name, missing_fields):
-    sender_email = "prishabadwaik812@gmail.com"
-    sender_password = "yljkxbxtfkdjboli"  # Use Gmail App Password
     subject = "Additional Information Required for Application"
     
     missing_str = ", ".join(missing_fields).title()
@@ -63,15 +50,11 @@ def send_missing_info_email(to_email, name, missing_fields):
     Recruitment Team
     """
 
-    message = f"Subject: {subject}\n\n{body}"
-
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, to_email, message)
-            print(f"✅ Missing info email sent to {to_email}")
-    except Exception as e:
-        print(f"❌ Failed to send missing info email to {to_email}: {e}")
+    outcome = get_mailer().send(to_email, subject, body)
+    if outcome["status"] == "sent":
+        print(f"✅ Missing info email sent to {to_email}")
+    else:
+        print(f"❌ Failed to send missing info email to {to_email}: {outcome['error']}")
 
 # def schedule_interview(name, email, date_time, duration_minutes=30):
 #     SCOPES = ['https://www.googleapis.com/auth/calendar']
@@ -109,53 +92,70 @@ def send_missing_info_email(to_email, name, missing_fields):
 #     return created_event.get('hangoutLink')
 # email_generator.py
 
+import threading
+import functools
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 import datetime
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 SERVICE_ACCOUNT_FILE = 'credentials.json'  # Ensure this file exists
-
-def schedule_interview(email, name, date_str, time_str):
+TIMEZONE = 'Asia/Kolkata'
+SLOT_MINUTES = 30
+WORKDAY_START = datetime.time(9, 0)
+WORKDAY_END = datetime.time(18, 0)
+CALENDAR_BATCH_SIZE = 50  # Calendar API maximum per batch request
+
+# httplib2 (used by googleapiclient) is not thread-safe; the outbox worker is multi-threaded
+_calendar_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def get_calendar_service():
+    # Credentials and the discovery document are loaded once per process
+    credentials = service_account.Credentials.from_service_account_file(
+        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    return build("calendar", "v3", credentials=credentials, cache_discovery=False)
+
+def parse_slot(date_str, time_str):
+    interview_date = datetime.datetime.strptime(date_str, "%Y/%m/%d")
+    interview_time = datetime.datetime.strptime(time_str, "%H:%M").time()
+    return datetime.datetime.combine(interview_date, interview_time)
+
+def interview_event(email, name, start, minutes=SLOT_MINUTES):
+    end = start + datetime.timedelta(minutes=minutes)
+    return {
+        'summary': f'Interview with {name}',
+        'location': 'Online',
+        'description': f'Interview for {name}. Email: {email}',
+        'start': {
+            'dateTime': start.isoformat(),
+            'timeZone': TIMEZONE,
+        },
+        'end': {
+            'dateTime': end.isoformat(),
+            'timeZone': TIMEZONE,
+        },
+        'attendees': [{'email': email}],
+        'conferenceData': {
+            'createRequest': {
+                # Stable per attendee + slot, so a retried insert reuses the same Meet conference
+                'requestId': f"{email}-{start:%Y%m%d%H%M}",
+                'conferenceSolutionKey': {'type': 'hangoutsMeet'}
+            }
+        },
+    }
+
+def schedule_interview(email, name, date_str, time_str, service=None):
     try:
         print(f"Scheduling interview for {name} ({email}) at {date_str} {time_str}")
 
-        # Convert date and time strings into RFC3339 datetime strings
-        interview_date = datetime.datetime.strptime(date_str, "%Y/%m/%d")
-        interview_time = datetime.datetime.strptime(time_str, "%H:%M").time()
-        interview_start = datetime.datetime.combine(interview_date, interview_time)
-        interview_end = interview_start + datetime.timedelta(minutes=30)
-
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        service = build("calendar", "v3", credentials=credentials)
-
-        event = {
-            'summary': f'Interview with {name}',
-            'location': 'Online',
-            'description': f'Interview for {name}. Email: {email}',
-            'start': {
-                'dateTime': interview_start.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            },
-            'end': {
-                'dateTime': interview_end.isoformat(),
-                'timeZone': 'Asia/Kolkata',
-            },
-            'attendees': [{'email': email}],
-            'conferenceData': {
-                'createRequest': {
-                    'requestId': f"{email}-{int(datetime.datetime.now().timestamp())}",
-                    'conferenceSolutionKey': {'type': 'hangoutsMeet'}
-                }
-            },
-        }
-
-        created_event = service.events().insert(
-            calendarId='primary',
-            body=event,
-            conferenceDataVersion=1
-        ).execute()
+        service = service or get_calendar_service()
+        with _calendar_lock:
+            created_event = service.events().insert(
+                calendarId='primary',
+                body=interview_event(email, name, parse_slot(date_str, time_str)),
+                conferenceDataVersion=1
+            ).execute()
 
         meet_link = created_event.get('hangoutLink') or created_event.get('htmlLink')
         print("✅ Event created:", meet_link)
@@ -164,3 +164,80 @@ def schedule_interview(email, name, date_str, time_str):
     except Exception as e:
         print("❌ Failed to schedule interview:", e)
         raise
+
+# ==========================
+# 📅 Bulk Scheduling
+# ==========================
+def _next_slot(cursor, slot_minutes, day_start, day_end, skip_weekends):
+    # Round up to the slot grid, then move into working hours (and off weekends)
+    minutes = cursor.hour * 60 + cursor.minute + (1 if cursor.second or cursor.microsecond else 0)
+    minutes = -(-minutes // slot_minutes) * slot_minutes
+    cursor = datetime.datetime.combine(cursor.date(), datetime.time()) + datetime.timedelta(minutes=minutes)
+    while True:
+        if cursor.time() < day_start:
+            cursor = datetime.datetime.combine(cursor.date(), day_start)
+        if cursor + datetime.timedelta(minutes=slot_minutes) > datetime.datetime.combine(cursor.date(), day_end) \
+                or (skip_weekends and cursor.weekday() >= 5):
+            cursor = datetime.datetime.combine(cursor.date() + datetime.timedelta(days=1), day_start)
+            continue
+        return cursor
+
+def allocate_slots(candidates, start, slot_minutes=SLOT_MINUTES, day_start=WORKDAY_START,
+                   day_end=WORKDAY_END, busy=(), skip_weekends=True):
+    """
+    Assign consecutive, non-overlapping slots to candidates in one pass, from `start`
+    onwards, within working hours and around `busy` (start, end) intervals.
+    Returns [(candidate, slot_start), ...] in candidate order.
+    """
+    busy = sorted(busy)
+    length = datetime.timedelta(minutes=slot_minutes)
+    allocated, j = [], 0
+    cursor = _next_slot(start, slot_minutes, day_start, day_end, skip_weekends)
+    for candidate in candidates:
+        while True:
+            while j < len(busy) and busy[j][1] <= cursor:
+                j += 1
+            if j < len(busy) and busy[j][0] < cursor + length:
+                cursor = _next_slot(busy[j][1], slot_minutes, day_start, day_end, skip_weekends)
+                continue
+            break
+        allocated.append((candidate, cursor))
+        cursor = _next_slot(cursor + length, slot_minutes, day_start, day_end, skip_weekends)
+    return allocated
+
+def schedule_interviews_batch(interviews, service=None, batch_size=CALENDAR_BATCH_SIZE):
+    """
+    interviews: list of dicts with email, name and start (datetime).
+    Inserts all events through the Calendar batch endpoint (batch_size per HTTP call)
+    and returns [(meet_link, error), ...] in input order.
+    """
+    service = service or get_calendar_service()
+    results = [(None, "No response from Calendar batch")] * len(interviews)
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            results[int(request_id)] = (None, str(exception))
+        else:
+            results[int(request_id)] = (response.get('hangoutLink') or response.get('htmlLink'), None)
+
+    for offset in range(0, len(interviews), batch_size):
+        batch = service.new_batch_http_request(callback=on_response)
+        chunk = range(offset, min(offset + batch_size, len(interviews)))
+        for i in chunk:
+            interview = interviews[i]
+            batch.add(
+                service.events().insert(
+                    calendarId='primary',
+                    body=interview_event(interview["email"], interview["name"], interview["start"]),
+                    conferenceDataVersion=1
+                ),
+                request_id=str(i)
+            )
+        try:
+            with _calendar_lock:
+                batch.execute()
+        except Exception as e:
+            print("❌ Calendar batch failed:", e)
+            for i in chunk:
+                results[i] = (None, str(e))
+    return results
@@ -0,0 +1,74 @@
+# embedding_cache.py — Persistent, Content-Addressed Embedding Cache (SQLite + float32 blobs)
+
+import time
+import numpy as np
+from constants import MODEL_CONFIG
+from storage import open_db, content_hash
+
+DB_NAME = "embeddings.sqlite"
+MAX_ENTRIES = MODEL_CONFIG.get("embedding_cache_max_entries", 200000)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS embeddings ("
+    " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)",
+)
+
+def _open():
+    return open_db(DB_NAME, SCHEMA)
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+def embedding_key(text, model=None):
+    return content_hash(model or MODEL_CONFIG["embedding_model"], normalize_text(text))
+
+# ==========================
+# 🔎 Lookup / Store
+# ==========================
+def get_many(keys):
+    # Returns {key: list[float]} for the keys present; refreshes their LRU timestamp
+    keys = list(set(keys))
+    found = {}
+    if not keys:
+        return found
+    try:
+        with _open() as conn:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            now = time.time()
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+    except Exception:
+        return found
+    return found
+
+def put_many(vectors):
+    # vectors: {key: embedding}. Callers must only pass successful embeddings, never fallbacks.
+    if not vectors:
+        return
+    now = time.time()
+    rows = [(key, np.asarray(vec, dtype=np.float32).tobytes(), now) for key, vec in vectors.items()]
+    try:
+        with _open() as conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            _evict(conn)
+    except Exception:
+        pass
+
+def _evict(conn):
+    (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    if count > MAX_ENTRIES:
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (count - MAX_ENTRIES,)
+        )
+
+def clear():
+    with _open() as conn:
+        conn.execute("DELETE FROM embeddings")
@@ -0,0 +1,67 @@
+# eval_cache.py — Persistent Cache of Deep GPT Evaluations (resume + JD + criteria)
+
+import time
+from storage import open_db, content_hash
+
+DB_NAME = "evaluations.sqlite"
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS evaluations ("
+    " key TEXT PRIMARY KEY, raw_response TEXT NOT NULL, model TEXT, created REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS roles ("
+    " key TEXT PRIMARY KEY, role TEXT NOT NULL, created REAL NOT NULL)",
+)
+
+def _open():
+    return open_db(DB_NAME, SCHEMA)
+
+def evaluation_key(jd, resume_text, role, domain, skills, experience_range, prompt_version, model):
+    # Every input that changes the GPT answer must be part of the key
+    return content_hash(
+        content_hash(resume_text),
+        content_hash(jd),
+        role, domain, skills, experience_range,
+        prompt_version, model
+    )
+
+def get(key):
+    try:
+        with _open() as conn:
+            row = conn.execute("SELECT raw_response FROM evaluations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    except Exception:
+        return None
+
+def put(key, raw_response, model=None):
+    try:
+        with _open() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO evaluations (key, raw_response, model, created) VALUES (?, ?, ?, ?)",
+                (key, raw_response, model, time.time())
+            )
+    except Exception:
+        pass
+
+# ========== JD Role Extraction Cache ==========
+def role_key(jd, model):
+    return content_hash(content_hash(jd), model)
+
+def get_role(key):
+    try:
+        with _open() as conn:
+            row = conn.execute("SELECT role FROM roles WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    except Exception:
+        return None
+
+def put_role(key, role):
+    try:
+        with _open() as conn:
+            conn.execute("INSERT OR REPLACE INTO roles (key, role, created) VALUES (?, ?, ?)", (key, role, time.time()))
+    except Exception:
+        pass
+
+def clear():
+    with _open() as conn:
+        conn.execute("DELETE FROM evaluations")
+        conn.execute("DELETE FROM roles")
@@ -0,0 +1,74 @@
+# exports.py — Change-Driven CSV and Columnar (Parquet) Exports
+
+import io
+import json
+import hashlib
+import pandas as pd
+from utils import upload_to_blob
+from candidate_store import attach_list_fields
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+# Columns whose change means an export is stale
+SIGNATURE_COLUMNS = ["resume_file", "name", "email", "verdict", "score", "recruiter_notes"]
+
+def export_signature(df):
+    # Cheap fingerprint of the candidate set + verdicts; avoids serializing on every rerun
+    cols = [c for c in SIGNATURE_COLUMNS if c in df.columns]
+    hashed = pd.util.hash_pandas_object(df[cols].astype(str), index=False).values
+    return hashlib.sha256(hashed.tobytes() + ",".join(cols).encode()).hexdigest()
+
+def to_csv_text(df):
+    if "candidate_id" in df.columns:
+        df = attach_list_fields(df)
+    return df.to_csv(index=False)
+
+def export_csv_if_changed(df, file_name, container, state):
+    """
+    Serialize + upload df only when its signature changed since the last export of
+    file_name. `state` (e.g. st.session_state) keeps only the signatures; downloads
+    serialize again on demand. Returns True if the file was exported now.
+    """
+    signature = export_signature(df)
+    if state.get(file_name) == signature:
+        return False
+    upload_to_blob(to_csv_text(df), file_name, container)
+    state[file_name] = signature
+    return True
+
+# ==========================
+# 🧱 Parquet Export (full screening run)
+# ==========================
+def _to_arrow_friendly(df):
+    # List/dict cells (red_flags, highlights, ...) become JSON strings so every column has one type
+    out = df.copy()
+    for col in out.columns:
+        if out[col].dtype == object:
+            out[col] = out[col].map(lambda v: json.dumps(v) if isinstance(v, (list, dict, tuple)) else (None if v is None else str(v)))
+    return out
+
+def to_parquet_bytes(df, compression="zstd"):
+    if pa is None:
+        return None
+    if "candidate_id" in df.columns:
+        df = attach_list_fields(df)
+    table = pa.Table.from_pandas(_to_arrow_friendly(df), preserve_index=False)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=compression)
+    return buffer.getvalue()
+
+def export_parquet_if_changed(df, file_name, container, state):
+    # Same change detection as the CSVs; does nothing without pyarrow
+    signature = export_signature(df)
+    if not PARQUET_AVAILABLE or state.get(file_name) == signature:
+        return False
+    upload_to_blob(to_parquet_bytes(df), file_name, container)
+    state[file_name] = signature
+    return True
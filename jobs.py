@@ -0,0 +1,240 @@
+# jobs.py — Resumable Screening Jobs with Per-Candidate Checkpoints
+
+import os
+import json
+import time
+import shutil
+import numpy as np
+from constants import MODEL_CONFIG
+from storage import open_db, cache_path, content_hash, CACHE_DIR
+from utils import EMBEDDING_DIM
+
+DB_NAME = "jobs.sqlite"
+# A job whose evaluations still fail after this many runs is closed with the failures kept
+JOB_MAX_RUNS = MODEL_CONFIG.get("job_max_runs", 3)
+# A "running" job with a checkpoint this recent is assumed to be worked on by another session
+JOB_ACTIVE_SECONDS = MODEL_CONFIG.get("job_active_seconds", 300)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " job_id TEXT PRIMARY KEY, params TEXT NOT NULL, status TEXT NOT NULL,"
+    " total INTEGER NOT NULL, runs INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, updated REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS job_items ("
+    " job_id TEXT NOT NULL, item TEXT NOT NULL, file_hash TEXT NOT NULL,"
+    " parsed TEXT, tokens BLOB, chunk_vectors BLOB, embedding BLOB,"
+    " result TEXT, failed INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL,"
+    " PRIMARY KEY (job_id, item))",
+)
+
+def _open():
+    return open_db(DB_NAME, SCHEMA)
+
+def _job_dir(job_id):
+    return os.path.join(CACHE_DIR, "jobs", job_id)
+
+def _pdf_path(job_id, file_hash):
+    return cache_path("jobs", job_id, f"{file_hash}.pdf")
+
+def job_id_for(params, item_hashes):
+    # Same JD, criteria, settings and items (slot, name, content) → same job, so re-submitting
+    # a batch resumes it. Job identity comes from the same keys as item identity: the same
+    # files in another order are a different job rather than a job with mismatched items.
+    items = sorted(f"{item}={file_hash}" for item, file_hash in item_hashes.items())
+    return content_hash("items-v2", json.dumps(params, sort_keys=True, default=str), *items)[:16]
+
+def item_key(index, name):
+    # Upload slot + file name: two different files with the same name stay separate items
+    return f"{index}:{name}"
+
+def display_name(item):
+    return item.partition(":")[2] or item
+
+class ScreeningJob:
+    """
+    One batch of resumes screened against one JD. Each candidate's parse, embedding and
+    final record are checkpointed as soon as they are produced; a resumed job skips every
+    stage that already finished. A failed GPT evaluation is kept but retried on resume,
+    for up to JOB_MAX_RUNS runs of the job.
+    Input PDFs are copied to local storage, so a job can resume without re-uploading.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        with _open() as conn:
+            row = conn.execute("SELECT params, status, total, runs FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown screening job: {job_id}")
+        self.params = json.loads(row[0])
+        self.status = row[1]
+        self.total = row[2]
+        self.runs = row[3]
+
+    @classmethod
+    def create(cls, params, payloads):
+        """
+        payloads: [(file_name, file_bytes)]. Items are keyed by item_key(slot, file_name).
+        Returns the existing job if this batch was seen before.
+        """
+        payloads = [(item_key(i, name), data) for i, (name, data) in enumerate(payloads)]
+        hashes = {item: content_hash(data) for item, data in payloads}
+        job_id = job_id_for(params, hashes)
+        now = time.time()
+        with _open() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, params, status, total, created, updated) VALUES (?, ?, 'running', ?, ?, ?)",
+                (job_id, json.dumps(params, default=str), len(payloads), now, now)
+            )
+            existing = {item for (item,) in conn.execute("SELECT item FROM job_items WHERE job_id = ?", (job_id,))}
+            for item, data in payloads:
+                if item in existing:
+                    continue
+                path = _pdf_path(job_id, hashes[item])
+                if not os.path.exists(path):
+                    with open(path, "wb") as f:
+                        f.write(data)
+                conn.execute(
+                    "INSERT INTO job_items (job_id, item, file_hash, updated) VALUES (?, ?, ?, ?)",
+                    (job_id, item, hashes[item], now)
+                )
+        return cls(job_id)
+
+    def start(self):
+        # Called once per run (new or resumed); the run count caps retries of failed evaluations
+        with _open() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', runs = runs + 1, updated = ? WHERE job_id = ? AND status != 'done'",
+                (time.time(), self.job_id)
+            )
+        self.runs += 1
+        self.status = "running"
+
+    # ---------- what is left to do ----------
+    def completed_results(self):
+        with _open() as conn:
+            rows = conn.execute(
+                "SELECT result FROM job_items WHERE job_id = ? AND result IS NOT NULL AND failed = 0", (self.job_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def pending_payloads(self):
+        # (item, file_bytes) for candidates not parsed yet, read lazily from disk
+        with _open() as conn:
+            rows = conn.execute(
+                "SELECT item, file_hash FROM job_items WHERE job_id = ? AND parsed IS NULL AND (result IS NULL OR failed = 1)",
+                (self.job_id,)
+            ).fetchall()
+        for item, file_hash in rows:
+            with open(_pdf_path(self.job_id, file_hash), "rb") as f:
+                yield item, f.read()
+
+    def parsed_items(self):
+        # (item, None, extracted) for candidates parsed but not embedded yet
+        with _open() as conn:
+            rows = conn.execute(
+                "SELECT item, parsed, tokens FROM job_items WHERE job_id = ? AND parsed IS NOT NULL"
+                " AND chunk_vectors IS NULL AND (result IS NULL OR failed = 1)", (self.job_id,)
+            ).fetchall()
+        for item, parsed, tokens in rows:
+            yield item, None, self._extracted(parsed, tokens)
+
+    def embedded_items(self):
+        # (item, None, extracted, embedding) for candidates embedded but not evaluated yet
+        with _open() as conn:
+            rows = conn.execute(
+                "SELECT item, parsed, tokens, chunk_vectors, embedding FROM job_items WHERE job_id = ?"
+                " AND chunk_vectors IS NOT NULL AND (result IS NULL OR failed = 1)", (self.job_id,)
+            ).fetchall()
+        for item, parsed, tokens, chunk_vectors, embedding in rows:
+            extracted = self._extracted(parsed, tokens)
+            extracted["chunk_vectors"] = np.frombuffer(chunk_vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+            yield item, None, extracted, np.frombuffer(embedding, dtype=np.float32).tolist()
+
+    def pool_records(self):
+        # Every embedded candidate of the job, including those finished before an interruption,
+        # as talent pool records (duplicates are linked before embedding, so never included)
+        with _open() as conn:
+            rows = conn.execute(
+                "SELECT item, parsed, embedding FROM job_items WHERE job_id = ? AND embedding IS NOT NULL", (self.job_id,)
+            ).fetchall()
+        for item, parsed, embedding in rows:
+            parsed = json.loads(parsed)
+            yield {
+                "resume_text": parsed["resume_text"],
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "resume_file": display_name(item),
+                "contact": parsed["contact"]
+            }
+
+    @staticmethod
+    def _extracted(parsed, tokens):
+        extracted = json.loads(parsed)
+        extracted["tokens"] = np.frombuffer(tokens, dtype=np.int32)
+        return extracted
+
+    # ---------- checkpoints ----------
+    def _update(self, item, **columns):
+        assignments = ", ".join(f"{c} = ?" for c in columns)
+        with _open() as conn:
+            conn.execute(
+                f"UPDATE job_items SET {assignments}, updated = ? WHERE job_id = ? AND item = ?",
+                (*columns.values(), time.time(), self.job_id, item)
+            )
+
+    def save_parse(self, item, extracted):
+        parsed = {k: extracted[k] for k in ("resume_text", "contact", "embedding_chunks", "embedding_chunk_tokens")}
+        parsed["extraction"] = extracted.get("extraction")
+        self._update(item, parsed=json.dumps(parsed, default=str),
+                     tokens=np.asarray(extracted["tokens"], dtype=np.int32).tobytes())
+
+    def save_embedding(self, item, chunk_vectors, embedding):
+        self._update(item, chunk_vectors=np.asarray(chunk_vectors, dtype=np.float32).tobytes(),
+                     embedding=np.asarray(embedding, dtype=np.float32).tobytes())
+
+    def save_result(self, item, result):
+        self._update(item, result=json.dumps(result, default=str), failed=int(bool(result.get("evaluation_failed"))))
+
+    def progress(self):
+        with _open() as conn:
+            row = conn.execute(
+                "SELECT COUNT(parsed), COUNT(chunk_vectors), SUM(result IS NOT NULL AND failed = 0), SUM(failed)"
+                " FROM job_items WHERE job_id = ?", (self.job_id,)
+            ).fetchone()
+        return {"total": self.total, "parsed": row[0], "embedded": row[1], "done": row[2] or 0, "failed": row[3] or 0}
+
+    def finish(self):
+        # Stored PDFs are only needed to resume; a job with retryable failures stays resumable
+        # until it has used its JOB_MAX_RUNS runs
+        status = "done" if not self.progress()["failed"] or self.runs >= JOB_MAX_RUNS else "interrupted"
+        with _open() as conn:
+            conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE job_id = ?", (status, time.time(), self.job_id))
+        if status == "done":
+            shutil.rmtree(_job_dir(self.job_id), ignore_errors=True)
+        self.status = status
+
+def list_jobs(unfinished_only=True, include_active=False):
+    """
+    [(job_id, params, status, total, updated)], newest first; updated is the job's latest
+    checkpoint. A "running" job was interrupted if no process is working on it, so running
+    jobs checkpointed within JOB_ACTIVE_SECONDS are left out unless include_active is set.
+    """
+    with _open() as conn:
+        query = (
+            "SELECT job_id, params, status, total,"
+            " MAX(updated, COALESCE((SELECT MAX(updated) FROM job_items WHERE job_items.job_id = jobs.job_id), 0))"
+            " AS last_update FROM jobs"
+        )
+        if unfinished_only:
+            query += " WHERE status != 'done'"
+        rows = conn.execute(query + " ORDER BY last_update DESC").fetchall()
+    active_since = time.time() - JOB_ACTIVE_SECONDS
+    return [
+        (job_id, json.loads(params), status, total, updated)
+        for job_id, params, status, total, updated in rows
+        if include_active or status != "running" or updated < active_since
+    ]
+
+def delete_job(job_id):
+    with _open() as conn:
+        conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+    shutil.rmtree(_job_dir(job_id), ignore_errors=True)
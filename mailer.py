@@ -0,0 +1,238 @@
+# mailer.py — Pooled, Throttled SMTP Sending with Per-Recipient Outcomes
+
+import os
+import atexit
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# Defaults can be overridden via environment variables (e.g. a local aiosmtpd for testing)
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 465))
+SMTP_USE_SSL = os.environ.get("SMTP_USE_SSL", "1") == "1"
+SENDER_EMAIL = os.environ.get("SMTP_USER", "prishabadwaik812@gmail.com")
+SENDER_PASSWORD = os.environ.get("SMTP_PASSWORD", "yljkxbxtfkdjboli")  # App password, NOT your Gmail password
+
+POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", 2))
+MESSAGES_PER_MINUTE = int(os.environ.get("SMTP_MESSAGES_PER_MINUTE", 60))
+MESSAGES_PER_CONNECTION = int(os.environ.get("SMTP_MESSAGES_PER_CONNECTION", 90))
+MAX_ATTEMPTS = 2
+# Pooled connections idle longer than this are probed with NOOP before reuse
+IDLE_CHECK_SECONDS = 30
+
+# Dropped connections and 4xx replies are worth one retry on a fresh connection
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def normalize_recipient(email):
+    email = str(email or "").strip().lower()
+    return email if "@" in email and email != "n/a" else ""
+
+
+def build_message(sender, to_email, subject, body):
+    message = MIMEMultipart()
+    message["From"] = sender
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.attach(MIMEText(body, "plain"))
+    return message.as_string()
+
+
+class Throttle:
+    """Spaces sends evenly so the whole mailer stays under `per_minute` messages."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BulkMailer:
+    """
+    Keeps up to `pool_size` authenticated SMTP connections open and reuses them across
+    messages; each connection is recycled after `messages_per_connection` sends.
+    send_bulk() deduplicates recipients and returns one outcome per message.
+    Point it at aiosmtpd with host="127.0.0.1", port=8025, use_ssl=False, username=None.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_USE_SSL, starttls=False,
+                 username=SENDER_EMAIL, password=SENDER_PASSWORD, sender=None,
+                 pool_size=POOL_SIZE, messages_per_minute=MESSAGES_PER_MINUTE,
+                 messages_per_connection=MESSAGES_PER_CONNECTION, timeout=30):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.username = username
+        self.password = password
+        self.sender = sender or username or "noreply@localhost"
+        self.pool_size = max(1, pool_size)
+        self.messages_per_connection = messages_per_connection
+        self.timeout = timeout
+        self.throttle = Throttle(messages_per_minute)
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(self.pool_size)
+        self.lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "connections": 0}
+
+    # ---------- connection pool ----------
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        with self.lock:
+            self.stats["connections"] += 1
+        return [server, 0, time.monotonic()]
+
+    def _is_alive(self, conn):
+        if time.monotonic() - conn[2] < IDLE_CHECK_SECONDS:
+            return True
+        try:
+            return conn[0].noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self):
+        self.slots.acquire()
+        try:
+            while True:
+                conn = self.idle.get_nowait()
+                if self._is_alive(conn):
+                    return conn
+                self._quit(conn)
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self.slots.release()
+                raise
+
+    def _checkin(self, conn, healthy=True):
+        if healthy and conn[1] < self.messages_per_connection:
+            self.idle.put(conn)
+        else:
+            self._quit(conn)
+        self.slots.release()
+
+    @staticmethod
+    def _quit(conn):
+        try:
+            conn[0].quit()
+        except Exception:
+            pass
+
+    # ---------- sending ----------
+    def send(self, to_email, subject, body):
+        """Send one message; returns an outcome dict {"email", "status", "error"}."""
+        recipient = normalize_recipient(to_email)
+        if not recipient:
+            return {"email": to_email, "status": "invalid", "error": "No valid email address"}
+
+        raw = build_message(self.sender, recipient, subject, body)
+        error = None
+        for attempt in range(MAX_ATTEMPTS):
+            self.throttle.wait()
+            try:
+                conn = self._checkout()
+            except Exception as e:
+                error = e
+                continue
+            try:
+                conn[0].sendmail(self.sender, recipient, raw)
+                conn[1] += 1
+                conn[2] = time.monotonic()
+                self._checkin(conn)
+                with self.lock:
+                    self.stats["sent"] += 1
+                return {"email": recipient, "status": "sent", "error": None}
+            except TRANSIENT_ERRORS as e:
+                self._checkin(conn, healthy=False)
+                error = e
+            except smtplib.SMTPResponseException as e:
+                # The connection is still usable after a rejected message
+                self._checkin(conn)
+                error = e
+                if not 400 <= e.smtp_code < 500:
+                    break
+            except smtplib.SMTPRecipientsRefused as e:
+                self._checkin(conn)
+                error = e
+                break
+            except Exception as e:
+                self._checkin(conn, healthy=False)
+                error = e
+                break
+
+        with self.lock:
+            self.stats["failed"] += 1
+        print(f"❌ Failed to send email to {recipient}: {error}")
+        return {"email": recipient, "status": "failed", "error": str(error)}
+
+    def send_bulk(self, messages):
+        """
+        messages: iterable of (to_email, subject, body). Each recipient gets at most one
+        message; later duplicates are reported as "duplicate" and not sent.
+        Returns outcomes in input order.
+        """
+        outcomes, jobs, seen = [], [], set()
+        for to_email, subject, body in messages:
+            recipient = normalize_recipient(to_email)
+            if not recipient:
+                outcomes.append({"email": to_email, "status": "invalid", "error": "No valid email address"})
+            elif recipient in seen:
+                outcomes.append({"email": recipient, "status": "duplicate", "error": None})
+            else:
+                seen.add(recipient)
+                outcomes.append(None)
+                jobs.append((len(outcomes) - 1, recipient, subject, body))
+
+        with ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="smtp") as executor:
+            futures = [(i, executor.submit(self.send, to, subject, body)) for i, to, subject, body in jobs]
+            for i, future in futures:
+                outcomes[i] = future.result()
+        return outcomes
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self.idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def summarize_outcomes(outcomes):
+    counts = {"sent": 0, "failed": 0, "duplicate": 0, "invalid": 0}
+    for outcome in outcomes:
+        counts[outcome["status"]] += 1
+    return counts
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+def get_mailer():
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = BulkMailer()
+            atexit.register(_mailer.close)
+        return _mailer
@@ -0,0 +1,267 @@
+# outbox.py — Durable, Idempotent Outbox for Candidate Emails and Interview Invites
+
+import json
+import time
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from storage import open_db, content_hash
+from mailer import get_mailer, normalize_recipient
+from candidate_store import record_delivery, record_deliveries
+import datetime
+from email_generator import schedule_interviews_batch, parse_slot, SLOT_MINUTES
+
+DB_NAME = "outbox.sqlite"
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 5.0      # seconds; doubled per failed attempt
+BACKOFF_MAX = 600.0
+CLAIM_BATCH = 32
+# An entry stuck in "sending" this long (e.g. the process died mid-send) is retried
+STALE_SENDING_SECONDS = 600
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS outbox ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, idempotency_key TEXT UNIQUE NOT NULL,"
+    " kind TEXT NOT NULL, candidate_id TEXT NOT NULL, template TEXT NOT NULL,"
+    " payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending',"
+    " attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, result TEXT,"
+    " next_attempt REAL NOT NULL, created REAL NOT NULL, updated REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)",
+)
+
+def _open():
+    return open_db(DB_NAME, SCHEMA)
+
+def idempotency_key(candidate_id, template, jd):
+    # Same candidate + template + JD is delivered at most once, however often it is clicked.
+    # candidate_id must be stable across re-evaluations: callers pass the frame's recipient_id
+    return content_hash("outbox", candidate_id, template, content_hash(jd))
+
+# ==========================
+# 📥 Enqueue (button handlers)
+# ==========================
+def enqueue(kind, candidate_id, template, jd, payload):
+    """
+    Add one delivery and return (idempotency_key, status). Repeating an enqueue is a
+    no-op while the entry is pending or sent; a permanently failed entry is re-armed.
+    """
+    key = idempotency_key(candidate_id, template, jd)
+    now = time.time()
+    with _open() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO outbox (idempotency_key, kind, candidate_id, template, payload, next_attempt, created, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, candidate_id, template, json.dumps(payload), now, now, now)
+        )
+        conn.execute(
+            "UPDATE outbox SET status = 'pending', attempts = 0, payload = ?, next_attempt = ?, updated = ?"
+            " WHERE idempotency_key = ? AND status = 'failed'",
+            (json.dumps(payload), now, now, key)
+        )
+        status = conn.execute("SELECT status FROM outbox WHERE idempotency_key = ?", (key,)).fetchone()[0]
+    if status == "pending":
+        record_delivery(candidate_id, template, "queued")
+        get_worker().wake()
+    return key, status
+
+def enqueue_emails(entries, template, jd):
+    """
+    entries: iterable of (recipient_id, to_email, subject, body). One email per distinct
+    address; returns counts of queued / already queued or sent / duplicate / invalid.
+    """
+    counts = {"queued": 0, "existing": 0, "duplicate": 0, "invalid": 0}
+    seen, rows = set(), []
+    now = time.time()
+    for candidate_id, to_email, subject, body in entries:
+        recipient = normalize_recipient(to_email)
+        if not recipient:
+            counts["invalid"] += 1
+        elif recipient in seen:
+            counts["duplicate"] += 1
+        else:
+            seen.add(recipient)
+            payload = json.dumps({"to": recipient, "subject": subject, "body": body})
+            rows.append((idempotency_key(candidate_id, template, jd), "email", candidate_id, template, payload, now, now, now))
+
+    with _open() as conn:
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO outbox (idempotency_key, kind, candidate_id, template, payload, next_attempt, created, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        # Permanently failed entries are re-armed by a repeated bulk send
+        conn.executemany(
+            "UPDATE outbox SET status = 'pending', attempts = 0, payload = ?, next_attempt = ?, updated = ?"
+            " WHERE idempotency_key = ? AND status = 'failed'",
+            [(row[4], now, now, row[0]) for row in rows]
+        )
+        counts["queued"] = conn.total_changes - before
+        pending = {key for (key,) in conn.execute("SELECT idempotency_key FROM outbox WHERE status = 'pending'")}
+    counts["existing"] = len(rows) - counts["queued"]
+    queued = [(row[2], template, "queued", None) for row in rows if row[0] in pending]
+    if queued:
+        record_deliveries(queued)
+        get_worker().wake()
+    return counts
+
+def scheduled_slots():
+    # (start, end) of every interview queued or already booked, for the slot allocator
+    with _open() as conn:
+        payloads = conn.execute("SELECT payload FROM outbox WHERE kind = 'interview' AND status != 'failed'").fetchall()
+    slots = []
+    for (payload,) in payloads:
+        payload = json.loads(payload)
+        start = parse_slot(payload["date"], payload["time"])
+        slots.append((start, start + datetime.timedelta(minutes=payload.get("minutes", SLOT_MINUTES))))
+    return slots
+
+def status_counts():
+    with _open() as conn:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+# ==========================
+# 🚚 Delivery
+# ==========================
+def _deliver(kind, payload):
+    # Returns (status, detail); status is "sent", "retry" or "failed"
+    if kind == "email":
+        outcome = get_mailer().send(payload["to"], payload["subject"], payload["body"])
+        if outcome["status"] == "sent":
+            return "sent", None
+        return ("failed" if outcome["status"] == "invalid" else "retry"), outcome["error"]
+    return "failed", f"Unknown outbox entry kind: {kind}"
+
+def _claim(limit):
+    now = time.time()
+    with _open() as conn:
+        conn.execute(
+            "UPDATE outbox SET status = 'pending', updated = ? WHERE status = 'sending' AND updated < ?",
+            (now, now - STALE_SENDING_SECONDS)
+        )
+        rows = conn.execute(
+            "SELECT id, kind, candidate_id, template, payload, attempts FROM outbox"
+            " WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?", (now, limit)
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            # The status guard makes the claim safe against a second worker process
+            cur = conn.execute("UPDATE outbox SET status = 'sending', updated = ? WHERE id = ? AND status = 'pending'", (now, row[0]))
+            if cur.rowcount:
+                claimed.append(row)
+    return claimed
+
+def _finish(entry, status, detail):
+    entry_id, kind, candidate_id, template, payload, attempts = entry
+    attempts += 1
+    now = time.time()
+    if status == "retry" and attempts >= MAX_ATTEMPTS:
+        status = "failed"
+    if status == "retry":
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+        with _open() as conn:
+            conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt = ?, updated = ? WHERE id = ?",
+                (attempts, detail, now + delay, now, entry_id)
+            )
+        record_delivery(candidate_id, template, "retrying", detail)
+        return
+    with _open() as conn:
+        conn.execute(
+            "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, result = ?, updated = ? WHERE id = ?",
+            (status, attempts, detail if status == "failed" else None, detail if status == "sent" else None, now, entry_id)
+        )
+    record_delivery(candidate_id, template, status, detail)
+
+def drain_once(executor=None, limit=CLAIM_BATCH):
+    """Claim and deliver one batch of due entries; returns how many were processed."""
+    entries = _claim(limit)
+
+    def process(entry):
+        try:
+            status, detail = _deliver(entry[1], json.loads(entry[4]))
+        except Exception as e:
+            status, detail = "retry", str(e)
+        _finish(entry, status, detail)
+
+    # Interview invites in the batch go to Calendar in one batched HTTP call
+    interviews = [entry for entry in entries if entry[1] == "interview"]
+    others = [entry for entry in entries if entry[1] != "interview"]
+    if interviews:
+        _deliver_interviews(interviews)
+
+    if executor is None:
+        for entry in others:
+            process(entry)
+    else:
+        list(executor.map(process, others))
+    return len(entries)
+
+def _deliver_interviews(entries):
+    valid, interviews = [], []
+    for entry in entries:
+        payload = json.loads(entry[4])
+        try:
+            start = parse_slot(payload["date"], payload["time"])
+        except (KeyError, ValueError) as e:
+            _finish(entry, "failed", f"Invalid interview slot: {e}")
+            continue
+        valid.append(entry)
+        interviews.append({"email": payload["email"], "name": payload["name"], "start": start})
+    if not valid:
+        return
+    try:
+        results = schedule_interviews_batch(interviews)
+    except Exception as e:
+        results = [(None, str(e))] * len(valid)
+    for entry, (meet_link, error) in zip(valid, results):
+        if error is None:
+            _finish(entry, "sent", meet_link)
+        else:
+            _finish(entry, "retry", error)
+
+
+class OutboxWorker:
+    """Daemon thread that drains the outbox; woken on enqueue and polls for due retries."""
+
+    def __init__(self, poll_seconds=5.0, max_workers=None):
+        self.poll_seconds = poll_seconds
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or get_mailer().pool_size, thread_name_prefix="outbox"
+        )
+        self.event = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        self.event.set()
+
+    def _run(self):
+        while not self.stopping:
+            try:
+                processed = drain_once(self.executor)
+            except Exception as e:
+                print(f"❌ Outbox worker error: {e}")
+                processed = 0
+            if not processed:
+                self.event.wait(self.poll_seconds)
+                self.event.clear()
+
+    def stop(self, timeout=30):
+        # Pending entries stay in SQLite and are picked up on the next start
+        self.stopping = True
+        self.event.set()
+        self.thread.join(timeout)
+        self.executor.shutdown(wait=True)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = OutboxWorker()
+            atexit.register(_worker.stop)
+        return _worker
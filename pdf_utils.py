@@ -4,6 +4,42 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from io import BytesIO
+import json
+import threading
+from collections import OrderedDict
+from storage import content_hash
+
+# Every candidate field rendered into the PDF — any change here must invalidate the cache
+SUMMARY_FIELDS = [
+    "name", "email", "phone", "jd_role", "jd_similarity", "skills_match", "domain_match",
+    "experience_match", "score", "verdict", "fitment", "summary_5_lines", "recruiter_notes",
+    "red_flags", "missing_gaps", "reasons_if_rejected", "recommendation", "highlights"
+]
+PDF_CACHE_SIZE = 512
+
+_pdf_cache = OrderedDict()
+# Shared by every Streamlit session thread and by deferred summary downloads
+_pdf_cache_lock = threading.Lock()
+
+def summary_pdf_key(candidate):
+    fields = {f: candidate.get(f) for f in SUMMARY_FIELDS}
+    return content_hash(json.dumps(fields, sort_keys=True, default=str))
+
+def get_summary_pdf(candidate, key=None):
+    # Render once per distinct content; reruns with unchanged inputs reuse the bytes
+    key = key or summary_pdf_key(candidate)
+    with _pdf_cache_lock:
+        pdf_bytes = _pdf_cache.get(key)
+        if pdf_bytes is not None:
+            _pdf_cache.move_to_end(key)
+            return pdf_bytes
+    # Rendered outside the lock so other threads are not held up by it
+    pdf_bytes = generate_summary_pdf(candidate)
+    with _pdf_cache_lock:
+        _pdf_cache[key] = pdf_bytes
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+    return pdf_bytes
 
 def generate_summary_pdf(candidate):
     buffer = BytesIO()
@@ -0,0 +1,150 @@
+# pipeline.py — Screening Pipeline Stages (PDF extraction pool → evaluation)
+
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from constants import MODEL_CONFIG
+import numpy as np
+from utils import extract_resume, get_embeddings_batch, pool_chunk_vectors, EMBEDDING_DIM
+
+PARSE_WORKERS = MODEL_CONFIG.get("parse_workers", max(1, (os.cpu_count() or 2) - 1))
+EMBED_FLUSH_SIZE = MODEL_CONFIG.get("embedding_flush_size", 64)
+EMBED_FLUSH_SECONDS = MODEL_CONFIG.get("embedding_flush_seconds", 1.0)
+
+# ==========================
+# 🏭 Shared Process Pool
+# ==========================
+_pool = None
+
+def get_parse_pool():
+    # One pool per server process, reused across Streamlit reruns. "spawn" avoids
+    # forking a process that already runs Streamlit's server threads.
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+def _reset_parse_pool(broken_pool):
+    global _pool
+    if _pool is broken_pool:
+        _pool.shutdown(wait=False)
+        _pool = None
+
+# ==========================
+# 📄 Streaming Extraction Stage
+# ==========================
+async def iter_extracted(payloads, max_in_flight=None):
+    """
+    Parse (file_name, file_bytes) pairs in the process pool and yield
+    (file_name, file_bytes, extracted) as each PDF finishes, in completion order.
+    With max_in_flight, payloads may be a lazy iterable (advanced in a worker thread,
+    so file reads / blob downloads stay off the event loop) and at most that many
+    PDFs are held at once — memory stays flat however many files there are.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+
+    async def extract(file_name, file_bytes):
+        try:
+            extracted = await loop.run_in_executor(pool, extract_resume, file_bytes)
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool; rebuild it next time and parse inline
+            _reset_parse_pool(pool)
+            extracted = await loop.run_in_executor(None, extract_resume, file_bytes)
+        except Exception:
+            extracted = await loop.run_in_executor(None, extract_resume, file_bytes)
+        return file_name, file_bytes, extracted
+
+    if max_in_flight is None:
+        pending = [asyncio.ensure_future(extract(name, data)) for name, data in payloads]
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+        return
+
+    source, pending, exhausted = iter(payloads), set(), False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                item = await loop.run_in_executor(None, next, source, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.ensure_future(extract(*item)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+# ==========================
+# 🧠 Batched Embedding Stage
+# ==========================
+async def iter_embedded(extracted_stream):
+    """
+    Group the extraction stream into embedding requests and yield
+    (file_name, file_bytes, extracted, embedding), where embedding is the
+    mean-pooled resume vector and extracted["chunk_vectors"] holds the
+    per-chunk float32 matrix. A batch is flushed once it
+    reaches EMBED_FLUSH_SIZE resumes or has been open for EMBED_FLUSH_SECONDS.
+    """
+    loop = asyncio.get_running_loop()
+    batch, opened_at = [], None
+
+    async def flush(items):
+        # Every chunk of every resume in the batch goes out in one request set; identical
+        # chunks (templated sections, re-uploads) are embedded once via the embedding cache
+        texts, token_counts, owners = [], [], []
+        for owner, (_, _, extracted) in enumerate(items):
+            texts.extend(extracted["embedding_chunks"])
+            token_counts.extend(extracted["embedding_chunk_tokens"])
+            owners.extend([owner] * len(extracted["embedding_chunks"]))
+        vectors = await loop.run_in_executor(None, get_embeddings_batch, texts, token_counts)
+
+        per_resume = [[] for _ in items]
+        for owner, vector in zip(owners, vectors):
+            per_resume[owner].append(vector)
+
+        embedded = []
+        for item, chunk_vectors in zip(items, per_resume):
+            item[2]["chunk_vectors"] = np.asarray(chunk_vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+            embedded.append(item + (pool_chunk_vectors(item[2]["chunk_vectors"]),))
+        return embedded
+
+    # The next item is awaited with a deadline, so an open batch is flushed once it is
+    # EMBED_FLUSH_SECONDS old even while the next parse is still running
+    stream, next_item = extracted_stream.__aiter__(), None
+    try:
+        while True:
+            if next_item is None:
+                next_item = asyncio.ensure_future(stream.__anext__())
+            timeout = max(0.0, opened_at + EMBED_FLUSH_SECONDS - loop.time()) if batch else None
+            done, _ = await asyncio.wait({next_item}, timeout=timeout)
+            if done:
+                try:
+                    item = next_item.result()
+                except StopAsyncIteration:
+                    next_item = None
+                    break
+                next_item = None
+                batch.append(item)
+                opened_at = opened_at or loop.time()
+                if len(batch) < EMBED_FLUSH_SIZE and loop.time() - opened_at < EMBED_FLUSH_SECONDS:
+                    continue
+            for embedded in await flush(batch):
+                yield embedded
+            batch, opened_at = [], None
+
+        if batch:
+            for embedded in await flush(batch):
+                yield embedded
+    finally:
+        if next_item is not None:
+            next_item.cancel()
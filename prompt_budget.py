@@ -0,0 +1,53 @@
+# prompt_budget.py — Token Budgets and Cache-Friendly Layout for the Deep Evaluation Prompt
+
+import functools
+from constants import MODEL_CONFIG, STRICT_GPT_PROMPT
+from utils import encode_text, get_encoder, EVAL_RESUME_TOKENS
+
+# Per-section caps (tokens); the resume cap lives in utils so extraction can stop at it
+EVAL_JD_TOKENS = MODEL_CONFIG.get("eval_jd_tokens", 2000)
+EVAL_CRITERIA_TOKENS = MODEL_CONFIG.get("eval_criteria_tokens", 300)
+EVAL_MAX_OUTPUT_TOKENS = MODEL_CONFIG.get("eval_max_output_tokens", 1200)
+# Chat formatting adds a few tokens per message on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def fit_tokens(tokens, budget):
+    # (text, token count) of the first `budget` tokens; decodes only what is kept
+    tokens = tokens[:budget] if budget else tokens
+    return get_encoder().decode(list(tokens)), len(tokens)
+
+def fit_text(text, budget):
+    return fit_tokens(encode_text(text or ""), budget)
+
+@functools.lru_cache(maxsize=64)
+def shared_prefix(jd, role, domain, skills, experience_range):
+    """
+    System prompt, JD and criteria as the leading messages. They are identical for every
+    candidate of a batch, so the provider's prompt cache can serve them after the first
+    call. Returns (messages, {section: tokens}); built once per batch.
+    """
+    system = STRICT_GPT_PROMPT.strip()
+    jd_text, jd_tokens = fit_text(jd, EVAL_JD_TOKENS)
+    criteria_text, criteria_tokens = fit_text(
+        f"ROLE: {role}\nDOMAIN: {domain}\nREQUIRED SKILLS: {skills}\nEXPERIENCE RANGE: {experience_range}",
+        EVAL_CRITERIA_TOKENS
+    )
+    messages = (
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"JD:\n{jd_text}\n\n{criteria_text}"},
+    )
+    return messages, {"system": len(encode_text(system)), "jd": jd_tokens, "criteria": criteria_tokens}
+
+def build_eval_messages(jd, role, domain, skills, experience_range, resume_text="", resume_tokens=None):
+    """
+    Deep evaluation messages: the shared prefix, then the candidate's resume (capped at
+    EVAL_RESUME_TOKENS) as the last message. Returns (messages, {section: tokens, "total"}).
+    """
+    prefix, counts = shared_prefix(jd, role, domain, skills, experience_range)
+    if resume_tokens is None:
+        resume_tokens = encode_text(resume_text or "")
+    resume, resume_count = fit_tokens(resume_tokens, EVAL_RESUME_TOKENS)
+    messages = [dict(m) for m in prefix] + [{"role": "user", "content": f"RESUME:\n{resume}"}]
+    counts = dict(counts, resume=resume_count)
+    counts["total"] = sum(counts.values()) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+    return messages, counts
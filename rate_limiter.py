@@ -0,0 +1,125 @@
+# rate_limiter.py — Concurrency + RPM/TPM Limiting for Azure OpenAI Calls
+
+import asyncio
+import random
+import time
+import weakref
+
+import openai
+from constants import MODEL_CONFIG
+
+# Defaults can be overridden via MODEL_CONFIG in constants.py
+MAX_CONCURRENCY = MODEL_CONFIG.get("max_concurrency", 8)
+REQUESTS_PER_MINUTE = MODEL_CONFIG.get("requests_per_minute", 60)
+TOKENS_PER_MINUTE = MODEL_CONFIG.get("tokens_per_minute", 80000)
+MAX_RETRIES = MODEL_CONFIG.get("max_retries", 5)
+BACKOFF_BASE = MODEL_CONFIG.get("backoff_base_seconds", 1.0)
+BACKOFF_MAX = MODEL_CONFIG.get("backoff_max_seconds", 60.0)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# ==========================
+# 🪣 Token Bucket
+# ==========================
+class TokenBucket:
+    """Refills `capacity` units per minute; `acquire` waits until enough are available."""
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.tokens = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request larger than the bucket would wait forever, so cap it
+        amount = min(float(amount), self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def drain(self):
+        # Called on a 429 so other in-flight callers back off too
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+
+# ==========================
+# 🚦 Per-Event-Loop Limiter
+# ==========================
+class RateLimiter:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, rpm=REQUESTS_PER_MINUTE, tpm=TOKENS_PER_MINUTE):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    async def run(self, make_call, estimated_tokens, max_retries=MAX_RETRIES):
+        """Await `make_call()` under the concurrency limit, rate buckets and retry policy."""
+        async with self.semaphore:
+            for attempt in range(max_retries + 1):
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated_tokens)
+                try:
+                    return await make_call()
+                except RETRYABLE_ERRORS as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = retry_delay(e, attempt)
+                    if isinstance(e, openai.RateLimitError):
+                        self.requests.drain()
+                        self.tokens.drain()
+                    await asyncio.sleep(delay)
+
+
+def estimate_tokens(messages):
+    # Same rough ~4 chars/token heuristic Azure uses when charging requests against TPM
+    return sum(len(m["content"]) for m in messages) // 4 + 1
+
+
+def retry_delay(error, attempt):
+    # Honour the server's Retry-After header when present, otherwise exponential backoff + jitter
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value) / (1000.0 if header == "retry-after-ms" else 1.0)
+            return min(max(seconds, 0.0), BACKOFF_MAX)
+        except ValueError:
+            continue
+    return min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX) * (0.5 + random.random() / 2)
+
+
+# asyncio primitives are bound to the loop they are first used on, and app.py
+# creates a fresh loop per analysis run, so keep one limiter per loop.
+_limiters = weakref.WeakKeyDictionary()
+_limiter_settings = {}
+
+def configure_rate_limiter(max_concurrency=None, rpm=None, tpm=None):
+    # Overrides the MODEL_CONFIG defaults for limiters created afterwards (e.g. CLI flags)
+    settings = {"max_concurrency": max_concurrency, "rpm": rpm, "tpm": tpm}
+    _limiter_settings.update({k: v for k, v in settings.items() if v is not None})
+
+def get_rate_limiter():
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = RateLimiter(**_limiter_settings)
+        _limiters[loop] = limiter
+    return limiter
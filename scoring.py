@@ -0,0 +1,52 @@
+# scoring.py — Vectorized Re-Scoring + Verdict Engine (no GPT calls, no per-row Python)
+
+import numpy as np
+import pandas as pd
+
+SUBSCORE_COLUMNS = ["skills_match", "domain_match", "experience_match", "jd_similarity"]
+VERDICTS = ["shortlist", "review", "reject"]
+# Same hard floor parse_gpt_response applies when it first scores a candidate
+SCORE_FLOOR = 50
+
+def ensure_score_columns(df):
+    # Raw sub-scores as float32; the GPT's own verdict kept apart from the derived one
+    for col in SUBSCORE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(np.float32)
+    if "gpt_verdict" not in df.columns:
+        df["gpt_verdict"] = df["verdict"]
+    if "verdict_override" not in df.columns:
+        df["verdict_override"] = ""
+    return df
+
+def compute_scores(df, weights):
+    matrix = np.column_stack([df[c].to_numpy(dtype=np.float32) for c in SUBSCORE_COLUMNS])
+    w = np.array([weights[c] for c in SUBSCORE_COLUMNS], dtype=np.float32)
+    return np.round(matrix @ w, 2)
+
+def classify_candidates(df, weights, thresholds, score_threshold, top_n=0):
+    """
+    Recompute score and verdict for every candidate from the stored sub-scores.
+    thresholds: {sub-score column: minimum} — below any of them means "review".
+    Recruiter overrides in verdict_override always win.
+    """
+    out = df.copy()
+    score = compute_scores(out, weights)
+    gpt_verdict = out["gpt_verdict"].astype(str).to_numpy()
+
+    reject = (gpt_verdict == "reject") | (score < SCORE_FLOOR) | (score < score_threshold)
+    review = np.zeros(len(out), dtype=bool)
+    for col, minimum in thresholds.items():
+        review |= out[col].to_numpy(dtype=np.float32) < minimum
+    verdict = np.where(reject, "reject", np.where(review, "review", "shortlist"))
+
+    if top_n and top_n > 0:
+        is_top = np.zeros(len(out), dtype=bool)
+        is_top[np.argsort(-score, kind="stable")[:top_n]] = True
+        verdict = np.where(is_top, "shortlist", np.where(verdict == "reject", "reject", "review"))
+
+    override = out["verdict_override"].astype(str).to_numpy()
+    verdict = np.where(np.isin(override, VERDICTS), override, verdict)
+
+    out["score"] = score
+    out["verdict"] = pd.Categorical(verdict, categories=VERDICTS)
+    return out
@@ -0,0 +1,190 @@
+# screen_cli.py — Headless Batch Screening: a folder (or blob prefix) of PDFs → JSONL
+#
+#   python screen_cli.py jd.txt --dir resumes/ --output results.jsonl --concurrency 16
+#   python screen_cli.py jd.txt --blob-prefix 2024/backend/ --container resumes
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from azure.storage.blob import BlobServiceClient
+from constants import AZURE_CONFIG
+from backend import get_resume_analysis_async, prepare_jd, skipped_json, close_async_client
+from utils import get_resume_similarity
+from pipeline import iter_extracted, iter_embedded, PARSE_WORKERS
+from rate_limiter import MAX_CONCURRENCY, configure_rate_limiter
+import talent_pool
+from dedup import DedupIndex, duplicate_record
+
+POOL_FLUSH_SIZE = 256
+
+# ==========================
+# 📂 Lazy Resume Sources
+# ==========================
+def iter_directory(path):
+    # Yields (file_name, file_bytes) one file at a time; only names are walked up front
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                with open(os.path.join(root, name), "rb") as f:
+                    yield os.path.splitext(name)[0], f.read()
+
+def iter_blob_prefix(prefix, container):
+    service = BlobServiceClient.from_connection_string(AZURE_CONFIG["connection_string"])
+    client = service.get_container_client(container)
+    for blob in client.list_blobs(name_starts_with=prefix):
+        if blob.name.lower().endswith(".pdf"):
+            data = client.download_blob(blob.name).readall()
+            yield os.path.splitext(os.path.basename(blob.name))[0], data
+
+# ==========================
+# 🚀 Streaming Screening
+# ==========================
+async def screen(payloads, jd, role, jd_vector, out, args):
+    """
+    Parse → dedup → embed → (similarity cutoff) → deep GPT evaluation, writing one JSON line per
+    candidate as soon as it finishes. At most args.concurrency evaluations and
+    args.max_in_flight PDFs are held at once; a full evaluation window stops pulling
+    new files (backpressure), so memory does not grow with the number of files.
+    Duplicate resumes are written as links to the first copy and not evaluated again.
+    """
+    stats = {"parsed": 0, "evaluated": 0, "skipped": 0, "failed": 0, "duplicate": 0,
+             "pages_read": 0, "pages_total": 0, "budget_stopped": 0,
+             "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    started = time.perf_counter()
+    pool_records, deep = [], set()
+    loop = asyncio.get_running_loop()
+
+    def write(result):
+        if result.get("duplicate_of"):
+            result["status"] = "duplicate"
+        elif result.get("prefiltered"):
+            result["status"] = "skipped"
+        elif result.get("evaluation_failed"):
+            result["status"] = "failed"
+        else:
+            result["status"] = "evaluated"
+        stats[result["status"]] += 1
+        for field in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            stats[field] += result.get(field, 0)
+        if not args.include_text:
+            result.pop("resume_text", None)
+        out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+        done = stats["evaluated"] + stats["skipped"] + stats["failed"] + stats["duplicate"]
+        if done % args.progress_every == 0:
+            print(f"[{time.perf_counter() - started:.0f}s] parsed {stats['parsed']} · evaluated {stats['evaluated']}"
+                  f" · skipped {stats['skipped']} · failed {stats['failed']} · duplicate {stats['duplicate']}", file=sys.stderr)
+
+    def finished(task):
+        # Runs as each evaluation completes, so its line is written without waiting for the window
+        deep.discard(task)
+        write(task.result())
+
+    async def flush_pool():
+        if pool_records and not args.no_pool:
+            await loop.run_in_executor(None, talent_pool.add_candidates, list(pool_records))
+        pool_records.clear()
+
+    async def deduplicated(parsed):
+        dedup = DedupIndex()
+        async for file_name, data, extracted in parsed:
+            stats["parsed"] += 1
+            pages = extracted["extraction"]
+            stats["pages_read"] += pages["pages_read"]
+            stats["pages_total"] += pages["page_count"]
+            stats["budget_stopped"] += pages["truncated"]
+            match = None if args.no_dedup else dedup.check(
+                file_name, extracted["resume_text"], extracted["contact"].get("email"))
+            if match is None:
+                yield file_name, data, extracted
+            else:
+                write(duplicate_record(file_name, *match, extracted["contact"]))
+
+    stream = iter_embedded(deduplicated(iter_extracted(payloads, max_in_flight=args.max_in_flight)))
+    async for file_name, _, extracted, resume_embedding in stream:
+        similarity = round(get_resume_similarity(extracted["chunk_vectors"], jd_vector) * 100, 2)
+        pool_records.append({
+            "resume_text": extracted["resume_text"],
+            "embedding": resume_embedding,
+            "resume_file": file_name,
+            "contact": extracted["contact"]
+        })
+        if len(pool_records) >= POOL_FLUSH_SIZE:
+            await flush_pool()
+
+        if similarity < args.min_similarity:
+            write(skipped_json(extracted["contact"], role, similarity, extracted["resume_text"], file_name,
+                               f"JD similarity {similarity} below prefilter cutoff {args.min_similarity}"))
+            continue
+
+        while len(deep) >= args.concurrency:
+            await asyncio.wait(set(deep), return_when=asyncio.FIRST_COMPLETED)
+        task = asyncio.ensure_future(get_resume_analysis_async(
+            jd=jd,
+            resume_text=extracted["resume_text"],
+            contact=extracted["contact"],
+            role=role,
+            domain=args.domain,
+            skills=args.skills,
+            experience_range=args.experience,
+            jd_similarity=similarity,
+            resume_file=file_name,
+            refresh_cache=args.refresh_cache,
+            resume_tokens=extracted["tokens"]
+        ))
+        deep.add(task)
+        task.add_done_callback(finished)
+
+    while deep:
+        await asyncio.wait(set(deep), return_when=asyncio.FIRST_COMPLETED)
+    await flush_pool()
+    await close_async_client()
+    return stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a folder or blob prefix of resume PDFs against a JD; writes JSONL.")
+    parser.add_argument("jd_file", help="Text file with the job description")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="Directory of resume PDFs (searched recursively)")
+    source.add_argument("--blob-prefix", help="Blob name prefix of resume PDFs")
+    parser.add_argument("--container", default=AZURE_CONFIG["resumes_container"], help="Blob container for --blob-prefix")
+    parser.add_argument("--output", "-o", default="-", help="JSONL output path (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="GPT evaluations in flight")
+    parser.add_argument("--max-in-flight", type=int, default=PARSE_WORKERS * 2, help="PDFs read/parsed at once")
+    parser.add_argument("--domain", default="")
+    parser.add_argument("--skills", default="", help="Required skills, comma separated")
+    parser.add_argument("--experience", default="0–1 yrs", help="Required experience range")
+    parser.add_argument("--min-similarity", type=float, default=0, help="Skip the deep evaluation below this JD similarity (0–100)")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached GPT evaluations")
+    parser.add_argument("--include-text", action="store_true", help="Include resume_text in each JSON line")
+    parser.add_argument("--no-dedup", action="store_true", help="Evaluate duplicate resumes again instead of linking them")
+    parser.add_argument("--no-pool", action="store_true", help="Do not add screened resumes to the talent pool")
+    parser.add_argument("--progress-every", type=int, default=25, help="Progress line to stderr every N candidates")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.concurrency = max(1, args.concurrency)
+    args.max_in_flight = max(1, args.max_in_flight)
+    args.progress_every = max(1, args.progress_every)
+    # The shared limiter caps every GPT call, so it must allow --concurrency calls in flight
+    configure_rate_limiter(max_concurrency=args.concurrency)
+    with open(args.jd_file, encoding="utf-8") as f:
+        jd = f.read().strip()
+    role, jd_vector = prepare_jd(jd)
+    print(f"🧠 Extracted Role: {role}", file=sys.stderr)
+
+    payloads = iter_directory(args.dir) if args.dir else iter_blob_prefix(args.blob_prefix, args.container)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = asyncio.run(screen(payloads, jd, role, jd_vector, out, args))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ Done: {stats}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
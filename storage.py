@@ -0,0 +1,42 @@
+# storage.py — Local On-Disk Storage Helpers (SQLite caches, indexes, queues)
+
+import os
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from constants import MODEL_CONFIG
+
+CACHE_DIR = os.environ.get("SCREENER_CACHE_DIR", MODEL_CONFIG.get("cache_dir", ".screener_cache"))
+
+_schemas_applied = set()
+
+def cache_path(*parts):
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+@contextmanager
+def open_db(db_name, schema=()):
+    # New connection per use: safe across Streamlit sessions, worker threads and
+    # processes. Commits on success, rolls back on error, always closes.
+    path = cache_path(db_name)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if path not in _schemas_applied:
+            for statement in schema:
+                conn.execute(statement)
+            conn.commit()
+            _schemas_applied.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def content_hash(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8", errors="ignore"))
+        h.update(b"\x1f")
+    return h.hexdigest()
@@ -0,0 +1,166 @@
+# talent_pool.py — Persistent Vector Index of Every Screened Resume
+
+import os
+import time
+import threading
+import numpy as np
+from constants import MODEL_CONFIG
+from storage import open_db, cache_path, content_hash
+from utils import EMBEDDING_DIM
+
+DB_NAME = os.path.join("talent_pool", "candidates.sqlite")
+VECTORS_FILE = cache_path("talent_pool", "vectors.f32")
+ANN_INDEX_FILE = cache_path("talent_pool", "vectors.hnsw")
+# Exact search is a single matrix-vector product; only switch to ANN for very large pools
+ANN_MIN_POOL_SIZE = MODEL_CONFIG.get("talent_pool_ann_min_size", 50000)
+
+try:
+    import hnswlib  # optional: pip install hnswlib
+except ImportError:
+    hnswlib = None
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS candidates ("
+    " row INTEGER PRIMARY KEY, resume_key TEXT UNIQUE NOT NULL, resume_file TEXT,"
+    " name TEXT, email TEXT, phone TEXT, resume_text TEXT, added REAL NOT NULL)",
+)
+
+_write_lock = threading.Lock()
+_ann = {"index": None, "size": 0, "version": None}
+
+def _open():
+    return open_db(DB_NAME, SCHEMA)
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# ==========================
+# 💾 Add / Update Candidates
+# ==========================
+def add_candidates(records):
+    """
+    records: dicts with resume_text, embedding, resume_file and contact.
+    The same resume text always maps to the same row, so re-screening updates in place.
+    """
+    records = [r for r in records if np.any(np.asarray(r["embedding"], dtype=np.float32))]
+    if not records:
+        return 0
+    with _write_lock, _open() as conn:
+        # Take SQLite's write lock before allocating rows: another process (screen_cli) may be
+        # adding to the same pool, and both must not claim the same row / vector slot
+        conn.execute("BEGIN IMMEDIATE")
+        (next_row,) = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM candidates").fetchone()
+        mode = "r+b" if os.path.exists(VECTORS_FILE) else "w+b"
+        with open(VECTORS_FILE, mode) as f:
+            for record in records:
+                resume_key = content_hash(record["resume_text"])
+                existing = conn.execute("SELECT row FROM candidates WHERE resume_key = ?", (resume_key,)).fetchone()
+                row = existing[0] if existing else next_row
+                if not existing:
+                    next_row += 1
+                f.seek(row * EMBEDDING_DIM * 4)
+                f.write(_normalize(record["embedding"]).tobytes())
+                contact = record.get("contact") or {}
+                conn.execute(
+                    "INSERT OR REPLACE INTO candidates"
+                    " (row, resume_key, resume_file, name, email, phone, resume_text, added)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row, resume_key, record.get("resume_file"), contact.get("name", "N/A"),
+                     contact.get("email", "N/A"), contact.get("phone", "N/A"),
+                     record["resume_text"], time.time())
+                )
+        # Any write (new rows or vectors updated in place) makes the ANN index stale
+        _invalidate_ann()
+    return len(records)
+
+def _invalidate_ann():
+    _ann.update(index=None, size=0, version=None)
+    try:
+        os.remove(ANN_INDEX_FILE)
+    except FileNotFoundError:
+        pass
+
+# ==========================
+# 🔎 Search
+# ==========================
+def pool_size():
+    try:
+        with _open() as conn:
+            (count,) = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM candidates").fetchone()
+    except Exception:
+        return 0
+    if not os.path.exists(VECTORS_FILE):
+        return 0
+    return min(count, os.path.getsize(VECTORS_FILE) // (EMBEDDING_DIM * 4))
+
+def load_vectors():
+    size = pool_size()
+    if not size:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.memmap(VECTORS_FILE, dtype=np.float32, mode="r", shape=(size, EMBEDDING_DIM))
+
+def _vectors_version():
+    # Changes on every write to the vector file, including writes from other processes
+    try:
+        return os.stat(VECTORS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _get_ann_index(vectors):
+    # Rebuilt (and saved) only when the vector file has been written since the last build
+    if hnswlib is None or len(vectors) < ANN_MIN_POOL_SIZE:
+        return None
+    version = _vectors_version()
+    if _ann["index"] is not None and _ann["size"] == len(vectors) and _ann["version"] == version:
+        return _ann["index"]
+    index = hnswlib.Index(space="ip", dim=EMBEDDING_DIM)
+    if os.path.exists(ANN_INDEX_FILE) and version is not None and os.stat(ANN_INDEX_FILE).st_mtime_ns >= version:
+        index.load_index(ANN_INDEX_FILE, max_elements=len(vectors))
+    if index.get_current_count() != len(vectors):
+        index = hnswlib.Index(space="ip", dim=EMBEDDING_DIM)
+        index.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+        index.add_items(np.asarray(vectors), np.arange(len(vectors)))
+        index.save_index(ANN_INDEX_FILE)
+    index.set_ef(200)
+    _ann.update(index=index, size=len(vectors), version=version)
+    return index
+
+def search(jd_vector, top_k=20):
+    # Returns the top_k stored candidates by cosine similarity to the JD, best first
+    vectors = load_vectors()
+    if not len(vectors) or top_k <= 0:
+        return []
+    query = _normalize(jd_vector)
+    top_k = min(int(top_k), len(vectors))
+
+    index = _get_ann_index(vectors)
+    if index is not None:
+        labels, distances = index.knn_query(query, k=top_k)
+        rows, scores = labels[0].tolist(), (1.0 - distances[0]).tolist()
+    else:
+        similarities = vectors @ query
+        top = np.argpartition(-similarities, top_k - 1)[:top_k]
+        top = top[np.argsort(-similarities[top])]
+        rows, scores = top.tolist(), similarities[top].tolist()
+
+    with _open() as conn:
+        found = {
+            row[0]: row for row in conn.execute(
+                f"SELECT row, resume_file, name, email, phone, resume_text FROM candidates"
+                f" WHERE row IN ({','.join('?' * len(rows))})", rows
+            )
+        }
+    results = []
+    for row, score in zip(rows, scores):
+        if row not in found:
+            continue
+        _, resume_file, name, email, phone, resume_text = found[row]
+        results.append({
+            "resume_file": resume_file,
+            "contact": {"name": name, "email": email, "phone": phone},
+            "resume_text": resume_text,
+            "similarity": float(score)
+        })
+    return results
@@ -4,71 +4,232 @@ import re
 import fitz  # PyMuPDF
 import numpy as np
 import tiktoken
+import openai
 import functools
-from azure.storage.blob import BlobClient
+from blob_uploader import get_uploader
 from sklearn.metrics.pairwise import cosine_similarity
 from constants import AZURE_CONFIG, MODEL_CONFIG
 from openai import AzureOpenAI
+import embedding_cache
 
 # ==========================
 # 📄 Resume Text Extractor
 # ==========================
-def parse_resume(file_bytes):
+# The deep evaluation is sent at most this many resume tokens (capped at prompt build time,
+# see prompt_budget.py)
+EVAL_RESUME_TOKENS = MODEL_CONFIG.get("eval_resume_tokens", 6000)
+# Resume tokens covered by the embedding chunks, i.e. JD similarity and the talent pool
+# (0 = the whole document, so long resumes are never silently truncated)
+EMBEDDING_TOKEN_BUDGET = MODEL_CONFIG.get("embedding_token_budget", 0)
+
+# Extraction stops at the first page that brings the text to this many tokens (0 reads
+# every page). By default it covers every consumer: the larger of the GPT and embedding
+# needs, which means the whole document unless the embedding budget is set.
+RESUME_TOKEN_BUDGET = MODEL_CONFIG.get(
+    "resume_token_budget", max(EMBEDDING_TOKEN_BUDGET, EVAL_RESUME_TOKENS) if EMBEDDING_TOKEN_BUDGET else 0
+)
+RESUME_MAX_PAGES = MODEL_CONFIG.get("resume_max_pages", 0)
+# Caps the text kept from a single page (portfolio pages, embedded data dumps)
+RESUME_MAX_PAGE_CHARS = MODEL_CONFIG.get("resume_max_page_chars", 20000)
+
+def read_resume_pages(file_bytes, token_budget=None, max_pages=None, max_page_chars=None):
+    """
+    Read pages lazily until the token budget (or page limit) is reached.
+    Returns {"text", "page_count", "pages_read", "chars", "truncated"}; truncated is True
+    when pages or page text were left unread.
+    """
+    token_budget = RESUME_TOKEN_BUDGET if token_budget is None else token_budget
+    max_pages = RESUME_MAX_PAGES if max_pages is None else max_pages
+    max_page_chars = RESUME_MAX_PAGE_CHARS if max_page_chars is None else max_page_chars
+    parts, tokens_read, truncated = [], 0, False
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        page_count = doc.page_count
+        for page in doc:
+            if (token_budget and tokens_read >= token_budget) or (max_pages and len(parts) >= max_pages):
+                break
+            page_text = page.get_text()
+            if max_page_chars and len(page_text) > max_page_chars:
+                page_text = page_text[:max_page_chars]
+                truncated = True
+            parts.append(page_text)
+            if token_budget:
+                tokens_read += len(encode_text(page_text))
+    text = "".join(parts).strip()
+    return {
+        "text": text,
+        "page_count": page_count,
+        "pages_read": len(parts),
+        "chars": len(text),
+        "truncated": truncated or len(parts) < page_count
+    }
+
+def parse_resume(file_bytes, token_budget=0):
+    # Whole document by default; pass a token budget to stop early
     try:
-        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-            text = ""
-            for page in doc:
-                text += page.get_text()
-        return text.strip()
-    except:
+        return read_resume_pages(file_bytes, token_budget=token_budget)["text"]
+    except Exception:
         return "Error reading resume"
 
 # ==========================
 # 📎 Chunk Text for GPT or Embedding
 # ==========================
-def chunk_text(text, max_tokens=3000, overlap=200):
-    enc = tiktoken.encoding_for_model("gpt-4")
-    tokens = enc.encode(text)
+@functools.lru_cache(maxsize=None)
+def get_encoder():
+    # Loading the BPE tables is expensive; build once per process
+    return tiktoken.encoding_for_model("gpt-4")
+
+def encode_text(text):
+    return get_encoder().encode(text)
+
+def chunk_tokens(tokens, max_tokens, overlap, max_chunks=None):
+    # Decode overlapping windows straight from an existing token array (no re-encode)
+    enc = get_encoder()
     chunks = []
     i = 0
-    while i < len(tokens):
-        chunk = tokens[i:i + max_tokens]
-        chunks.append(enc.decode(chunk))
+    while i < len(tokens) and (max_chunks is None or len(chunks) < max_chunks):
+        chunks.append(enc.decode(list(tokens[i:i + max_tokens])))
         i += max_tokens - overlap
     return chunks
 
+def chunk_text(text, max_tokens=3000, overlap=200):
+    return chunk_tokens(encode_text(text), max_tokens, overlap)
+
 def get_text_chunks(text, max_tokens=800, overlap=100):
-    enc = tiktoken.encoding_for_model("gpt-4")
-    tokens = enc.encode(text)
-    chunks = []
-    i = 0
-    while i < len(tokens):
-        chunk = tokens[i:i + max_tokens]
-        chunks.append(enc.decode(chunk))
-        i += max_tokens - overlap
-    return chunks
+    return chunk_tokens(encode_text(text), max_tokens, overlap)
+
+def embedding_chunks_from_tokens(tokens, chunk_tokens_size=None):
+    # Non-overlapping windows covering the whole resume, each embedded (and cached) on its own
+    size = chunk_tokens_size or EMBEDDING_CHUNK_TOKENS
+    enc = get_encoder()
+    texts, counts = [], []
+    for i in range(0, len(tokens), size):
+        window = list(tokens[i:i + size])
+        texts.append(enc.decode(window))
+        counts.append(len(window))
+    return texts, counts
+
+def embedding_input_from_tokens(tokens, max_tokens=None):
+    # Contiguous prefix within the embedding model's input limit — no duplicated overlap
+    tokens = tokens[:max_tokens or EMBEDDING_MAX_INPUT_TOKENS]
+    return get_encoder().decode(list(tokens)), len(tokens)
 
 # ==========================
 # 🧠 Embedding + Similarity
 # ==========================
-def get_embedding(text):
-    client = AzureOpenAI(
-        api_key=AZURE_CONFIG["openai_key"],
-        api_version=AZURE_CONFIG["api_version"],
-        azure_endpoint=AZURE_CONFIG["azure_endpoint"]
-    )
+EMBEDDING_DIM = 1536
+# Azure allows up to 2048 inputs per embeddings request and 8191 tokens per input
+EMBEDDING_BATCH_SIZE = MODEL_CONFIG.get("embedding_batch_size", 2048)
+EMBEDDING_BATCH_TOKENS = MODEL_CONFIG.get("embedding_batch_tokens", 250000)
+EMBEDDING_MAX_INPUT_TOKENS = MODEL_CONFIG.get("embedding_max_input_tokens", 8191)
+EMBEDDING_CHUNK_TOKENS = MODEL_CONFIG.get("embedding_chunk_tokens", 512)
+# How chunk vectors are reduced to one resume-vs-JD score: "mean" (mean-pooled vector) or "max" (best chunk)
+SIMILARITY_POOLING = MODEL_CONFIG.get("similarity_pooling", "mean")
+
+_embedding_client = None
+
+def get_embedding_client():
+    global _embedding_client
+    if _embedding_client is None:
+        _embedding_client = AzureOpenAI(
+            api_key=AZURE_CONFIG["openai_key"],
+            api_version=AZURE_CONFIG["api_version"],
+            azure_endpoint=AZURE_CONFIG["azure_endpoint"],
+            max_retries=MODEL_CONFIG.get("max_retries", 5)
+        )
+    return _embedding_client
+
+def _pack_embedding_batches(items):
+    # items: (index, text, n_tokens) — greedily fill requests up to the input/token limits
+    batch, batch_tokens = [], 0
+    for item in items:
+        if batch and (len(batch) >= EMBEDDING_BATCH_SIZE or batch_tokens + item[2] > EMBEDDING_BATCH_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += item[2]
+    if batch:
+        yield batch
+
+def _embed_batch(batch, vectors):
     try:
-        response = client.embeddings.create(
-            input=[text],
+        response = get_embedding_client().embeddings.create(
+            input=[text for _, text, _ in batch],
             model=MODEL_CONFIG["embedding_model"]
         )
-        return response.data[0].embedding
-    except:
-        return [0.0] * 1536  # fallback vector
+        for d in response.data:
+            vectors[batch[d.index][0]] = d.embedding
+    except openai.BadRequestError as e:
+        # A request-size rejection — halve and retry; a single input gives up
+        if len(batch) > 1:
+            mid = len(batch) // 2
+            _embed_batch(batch[:mid], vectors)
+            _embed_batch(batch[mid:], vectors)
+        else:
+            print(f"❌ Embedding input rejected: {e}")
+    except Exception as e:
+        # Auth failures, exhausted 429 retries, outages: splitting would only multiply requests
+        print(f"❌ Embedding request for {len(batch)} inputs failed: {e}")
+
+def get_embeddings_batch(texts, token_counts=None):
+    # Returns one vector per input (same order); failed inputs get the zero fallback vector.
+    # token_counts (optional) skips re-tokenizing inputs that were already truncated.
+    # Hits come from the persistent cache; identical texts are only sent once; failures are never cached.
+    keys = [embedding_cache.embedding_key(t) if t and t.strip() else None for t in texts]
+    cached = embedding_cache.get_many([k for k in keys if k])
+
+    vectors = [cached.get(k) if k else None for k in keys]
+    first_index = {}
+    for i, key in enumerate(keys):
+        if key and vectors[i] is None:
+            first_index.setdefault(key, i)
+
+    fetched = [None] * len(texts)
+    items = []
+    for i in first_index.values():
+        text = texts[i]
+        if token_counts is not None and token_counts[i] <= EMBEDDING_MAX_INPUT_TOKENS:
+            # Caller already tokenized and truncated (see embedding_input_from_tokens)
+            items.append((i, text, token_counts[i]))
+            continue
+        text, n_tokens = embedding_input_from_tokens(encode_text(text))
+        items.append((i, text, n_tokens))
+
+    for batch in _pack_embedding_batches(items):
+        _embed_batch(batch, fetched)
+
+    embedding_cache.put_many({keys[i]: fetched[i] for i in first_index.values() if fetched[i] is not None})
+    for i, key in enumerate(keys):
+        if vectors[i] is None and key in first_index:
+            vectors[i] = fetched[first_index[key]]
+
+    return [v if v is not None else [0.0] * EMBEDDING_DIM for v in vectors]
+
+def get_embedding(text):
+    return get_embeddings_batch([text])[0]
 
-@functools.lru_cache(maxsize=10)
 def get_embedding_cached(text):
-    return tuple(get_embedding(text))  # lru_cache requires hashable input
+    # Backed by the on-disk embedding cache (see embedding_cache.py); tuple kept for callers
+    return tuple(get_embedding(text))
+
+def pool_chunk_vectors(chunk_vectors):
+    # Mean of the successfully embedded chunks (zero fallback rows are ignored)
+    matrix = np.asarray(chunk_vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    matrix = matrix[np.any(matrix != 0, axis=1)]
+    if not len(matrix):
+        return [0.0] * EMBEDDING_DIM
+    return matrix.mean(axis=0).tolist()
+
+def get_resume_similarity(chunk_vectors, jd_vector, pooling=None):
+    pooling = pooling or SIMILARITY_POOLING
+    matrix = np.asarray(chunk_vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    matrix = matrix[np.any(matrix != 0, axis=1)]
+    jd = np.asarray(jd_vector, dtype=np.float32)
+    if not len(matrix) or jd.shape != (EMBEDDING_DIM,) or not np.any(jd):
+        return 0.0
+    if pooling == "max":
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(jd)
+        return float(np.max(matrix @ jd / norms))
+    return get_cosine_similarity(pool_chunk_vectors(matrix), list(jd))
 
 def get_cosine_similarity(vec1, vec2):
     try:
@@ -112,29 +273,43 @@ def extract_contact_info(text):
         "phone": phone
     }
 
+# ==========================
+# 🧩 Full Extraction Stage (runs in a worker process)
+# ==========================
+def extract_resume(file_bytes):
+    # Top-level so ProcessPoolExecutor can pickle it; returns only plain data
+    # Resume is tokenized once here; GPT context and embedding chunks are both cut from these tokens
+    # Only the pages needed to cover RESUME_TOKEN_BUDGET are read and tokenized; embedding
+    # chunks cover EMBEDDING_TOKEN_BUDGET of them (all by default)
+    try:
+        pages = read_resume_pages(file_bytes)
+    except Exception:
+        pages = {"text": "Error reading resume", "page_count": 0, "pages_read": 0, "chars": 0, "truncated": False}
+    resume_text = pages.pop("text")
+    contact = extract_contact_info(resume_text)
+    tokens = np.asarray(encode_text(resume_text), dtype=np.int32)
+    chunk_texts, chunk_counts = embedding_chunks_from_tokens(
+        tokens[:EMBEDDING_TOKEN_BUDGET] if EMBEDDING_TOKEN_BUDGET else tokens
+    )
+    return {
+        "resume_text": resume_text,
+        "contact": contact,
+        "tokens": tokens,
+        "embedding_chunks": chunk_texts,
+        "embedding_chunk_tokens": chunk_counts,
+        "extraction": pages
+    }
+
 # ==========================
 # ☁️ Azure Uploads (Resumes, PDFs, CSVs)
 # ==========================
+# Uploads are queued on the shared background uploader (see blob_uploader.py) and
+# return a Future; identical content already in the container is not re-sent.
 def upload_to_blob(file_bytes, file_name, container):
-    blob = BlobClient.from_connection_string(
-        conn_str=AZURE_CONFIG["connection_string"],
-        container_name=container,
-        blob_name=file_name
-    )
-    blob.upload_blob(file_bytes, overwrite=True)
+    return get_uploader().submit(file_bytes, file_name, container)
 
 def save_summary_to_blob(pdf_bytes, file_name, container):
-    blob = BlobClient.from_connection_string(
-        conn_str=AZURE_CONFIG["connection_string"],
-        container_name=container,
-        blob_name=file_name
-    )
-    blob.upload_blob(pdf_bytes, overwrite=True)
+    return get_uploader().submit(pdf_bytes, file_name, container)
 
 def save_csv_to_blob(df, file_name, container):
-    blob = BlobClient.from_connection_string(
-        conn_str=AZURE_CONFIG["connection_string"],
-        container_name=container,
-        blob_name=file_name
-    )
-    blob.upload_blob(df.to_csv(index=False), overwrite=True)
+    return get_uploader().submit(df.to_csv(index=False), file_name, container)